@@ -0,0 +1,153 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import matplotlib
+
+matplotlib.use('Agg')
+
+import networkx as nx
+import numpy as np
+import centrality
+import hierarchy
+import main
+import sparse_graph
+import synthetic_data
+
+scales = {
+    'small': {'users': 1000, 'subreddits': 100, 'submissions': 2000, 'comments': 10000},
+    'medium': {'users': 10000, 'subreddits': 1000, 'submissions': 20000, 'comments': 100000},
+    'large': {'users': 100000, 'subreddits': 5000, 'submissions': 200000, 'comments': 1000000}
+}
+
+
+def use_workspace(path):
+    # Every path main.py works with points into the benchmark's own workspace
+    main.submission_data_path = f"{path}/submissions"
+    main.comment_data_path = f"{path}/comments"
+    main.cleansed_submission_data_path = f"{path}/submissions_cleansed/submissions"
+    main.cleansed_comment_data_path = f"{path}/comments_cleansed/comments"
+    main.graphs_path = f"{path}/graphs"
+    main.dendrograms_path = f"{path}/dendrograms"
+    main.plots_path = f"{path}/plots"
+    main.export_gml = False
+    for directory in (main.graphs_path, main.dendrograms_path):
+        os.makedirs(directory, exist_ok=True)
+
+
+def reset_caches():
+    main.statistics_cache.clear()
+    centrality.cache.clear()
+
+
+def snet_dominant_component():
+    labels, adjacency, _ = main.load_adjacency('snet')
+    graph = sparse_graph.to_networkx(labels, adjacency)
+    threshold = np.percentile([w for _, _, w in graph.edges(data='weight')], 90) if graph.number_of_edges() else 0
+    graph.remove_edges_from([(u, v) for u, v, w in graph.edges(data='weight') if w < threshold])
+    return graph.subgraph(max(nx.connected_components(graph), key=len)).copy()
+
+
+def top_subreddits_graph(size=30):
+    graph = main.load_graph('snet')
+    top = sorted(graph.degree(weight='weight'), key=lambda item: item[1], reverse=True)[:size]
+    return graph.subgraph([node for node, _ in top]).copy()
+
+
+# Benchmarks run in this order, later ones read what earlier ones wrote
+benchmarks = {
+    'create_secondary_dataset': lambda: main.create_secondary_dataset(chunksize=100000),
+    'model_snet_graph': lambda: main.model_snet_graph(),
+    'model_usernet_graph': lambda: main.model_usernet_graph(),
+    'centrality_analysis': lambda: main.centrality_analysis(snet_dominant_component(), epsilon=0.05),
+    'dendrogram_greedy': lambda: main.plot_and_save_dendrogram(snet_dominant_component()),
+    'girvan_newman_linkage': lambda: hierarchy.girvan_newman_linkage(top_subreddits_graph())
+}
+
+
+def measure(function, repeat):
+    wall_times, cpu_times = [], []
+    for _ in range(repeat):
+        reset_caches()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            function()
+        wall_times.append(time.perf_counter() - wall_start)
+        cpu_times.append(time.process_time() - cpu_start)
+    # A separate run under tracemalloc, which would otherwise slow the timed runs down
+    reset_caches()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'wall_time': min(wall_times), 'cpu_time': min(cpu_times), 'peak_memory': peak_memory}
+
+
+def run(scale_names, selected, repeat, months, seed):
+    results = []
+    for scale in scale_names:
+        with tempfile.TemporaryDirectory() as workspace:
+            synthetic_data.generate_dataset(workspace, months=months, seed=seed, **scales[scale])
+            use_workspace(workspace)
+            for name, function in benchmarks.items():
+                if selected and name not in selected:
+                    # Later benchmarks still need the artifacts of skipped ones
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        function()
+                    continue
+                result = {'scale': scale, 'benchmark': name, **measure(function, repeat)}
+                print(f"{scale:>8} {name:<26} {result['wall_time']:10.3f} s {result['peak_memory'] / 2 ** 20:10.1f} MiB")
+                results.append(result)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    previous = {(result['scale'], result['benchmark']): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        key = (result['scale'], result['benchmark'])
+        if key not in previous:
+            continue
+        for metric in ('wall_time', 'peak_memory'):
+            if result[metric] > previous[key][metric] * (1 + tolerance):
+                regressions.append(f"{key[0]} {key[1]}: {metric} {previous[key][metric]:.4g} -> {result[metric]:.4g}")
+    return regressions
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'networkx': nx.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the analysis pipeline on synthetic Reddit dumps.')
+    parser.add_argument('--scales', nargs='+', choices=list(scales), default=['small'])
+    parser.add_argument('--benchmarks', nargs='+', choices=list(benchmarks), default=None)
+    parser.add_argument('--months', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help='earlier results to check for regressions against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    results = run(args.scales, args.benchmarks, args.repeat, args.months, args.seed)
+    with open(args.output, 'w') as output_file:
+        json.dump({'environment': environment(), 'parameters': vars(args), 'results': results}, output_file, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,167 @@
+import math
+import os
+import numpy as np
+from scipy import sparse
+from scipy.sparse import linalg
+import instrumentation
+import parallel
+import sparse_graph
+
+# Results already computed for a graph, keyed by its fingerprint, the measure and its parameters
+cache = {}
+
+
+def cached(adjacency, key, compute):
+    key = (sparse_graph.fingerprint(adjacency),) + key
+    if key in cache:
+        instrumentation.count('cache_hits')
+    else:
+        instrumentation.count('cache_misses')
+        cache[key] = compute()
+    return cache[key]
+
+
+def spectrum(adjacency, directed=None):
+    # The largest eigenvalue of A^T and its eigenvector serve both eigenvector and Katz centrality
+    def compute():
+        transposed = sparse.csr_array(adjacency.T, dtype=np.float64)
+        n = transposed.shape[0]
+        if n < 3:
+            eigenvalues, eigenvectors = np.linalg.eig(transposed.toarray())
+            index = eigenvalues.real.argmax()
+            return eigenvalues[index].real, np.abs(eigenvectors[:, index].real)
+        if sparse_graph.is_directed(adjacency, directed):
+            eigenvalues, eigenvectors = linalg.eigs(transposed, k=1, which='LR')
+        else:
+            eigenvalues, eigenvectors = linalg.eigsh(transposed, k=1, which='LA')
+        return eigenvalues[0].real, np.abs(eigenvectors[:, 0].real)
+    return cached(adjacency, ('spectrum',), compute)
+
+
+def lambda_max(adjacency, directed=None):
+    return spectrum(adjacency, directed)[0]
+
+
+def degree_centrality(adjacency, directed=None):
+    n = adjacency.shape[0]
+    pattern = adjacency.astype(bool)
+    degrees = np.diff(pattern.indptr)
+    if sparse_graph.is_directed(adjacency, directed):
+        degrees = degrees + np.bincount(pattern.indices, minlength=n)
+    return degrees / max(n - 1, 1)
+
+
+def eigenvector_centrality(adjacency, directed=None):
+    vector = spectrum(adjacency, directed)[1]
+    return vector / np.linalg.norm(vector)
+
+
+def katz_centrality(adjacency, alpha=None, beta=1.0, tolerance=1e-10, max_iterations=1000, directed=None):
+    if alpha is None:
+        alpha = 1 / (2 * lambda_max(adjacency, directed))
+    beta = np.broadcast_to(np.asarray(beta, dtype=np.float64), adjacency.shape[:1])
+
+    def compute():
+        transposed = sparse.csr_array(adjacency.T, dtype=np.float64)
+        x = np.zeros(adjacency.shape[0])
+        for _ in range(max_iterations):
+            x_last = x
+            x = alpha * (transposed @ x_last) + beta
+            if np.abs(x - x_last).sum() < adjacency.shape[0] * tolerance:
+                break
+        return x / np.linalg.norm(x)
+    return cached(adjacency, ('katz', alpha, beta.tobytes(), tolerance), compute)
+
+
+def single_source_paths(pattern, source):
+    n = pattern.shape[0]
+    distances = np.full(n, -1)
+    sigma = np.zeros(n)
+    distances[source] = 0
+    sigma[source] = 1
+    layers = [np.array([source])]
+    while True:
+        frontier = pattern[layers[-1]]
+        # Paths reaching every neighbour of the frontier, through any node of the frontier
+        paths = np.bincount(frontier.indices, weights=np.repeat(sigma[layers[-1]], np.diff(frontier.indptr)),
+                            minlength=n)
+        layer = np.flatnonzero((paths > 0) & (distances < 0))
+        if len(layer) == 0:
+            return distances, sigma, layers
+        distances[layer] = len(layers)
+        sigma[layer] = paths[layer]
+        layers.append(layer)
+
+
+def source_centralities(sources):
+    pattern = parallel.shared['pattern']
+    n = pattern.shape[0]
+    dependencies = np.zeros(n)
+    distance_sums = np.zeros(n)
+    reach_counts = np.zeros(n)
+    for source in sources:
+        distances, sigma, layers = single_source_paths(pattern, source)
+        # Brandes' dependency accumulation, one BFS layer at a time, from the farthest layer backwards
+        delta = np.zeros(n)
+        for depth in range(len(layers) - 2, -1, -1):
+            rows = pattern[layers[depth]]
+            targets = rows.indices
+            successors = distances[targets] == depth + 1
+            coefficients = np.divide(1 + delta[targets], sigma[targets], out=np.zeros(len(targets)),
+                                     where=successors)
+            row_ids = np.repeat(np.arange(len(layers[depth])), np.diff(rows.indptr))
+            delta[layers[depth]] = sigma[layers[depth]] * np.bincount(row_ids, weights=coefficients,
+                                                                      minlength=len(layers[depth]))
+        delta[source] = 0
+        dependencies += delta
+        reached = distances > 0
+        distance_sums[reached] += distances[reached]
+        reach_counts[reached] += 1
+    return dependencies, distance_sums, reach_counts
+
+
+def pivot_count(n, epsilon, delta):
+    # Hoeffding bound with a union bound over all nodes, for scores averaged over the pivots
+    return math.ceil(math.log(2 * n / delta) / (2 * epsilon ** 2))
+
+
+def path_centralities(adjacency, epsilon=None, delta=0.1, seed=None, processes=None):
+    n = adjacency.shape[0]
+
+    def compute():
+        pattern = sparse.csr_array(adjacency.astype(bool), dtype=np.float64)
+        k = n if epsilon is None else min(n, pivot_count(n, epsilon, delta))
+        pivots = np.arange(n) if k == n else np.random.default_rng(seed).choice(n, k, replace=False)
+        chunk_size = max(math.ceil(k / (4 * (processes or os.cpu_count() or 1))), 1)
+        results = parallel.map_in_pool(source_centralities, parallel.chunks(pivots, chunk_size),
+                                       state={'pattern': pattern}, processes=processes)
+        dependencies, distance_sums, reach_counts = (np.sum(values, axis=0) for values in zip(*results))
+        scale = n / k
+        betweenness = dependencies * scale / ((n - 1) * (n - 2)) if n > 2 else dependencies * 0
+        # Wasserman and Faust closeness, over the nodes that reach each node, as networkx computes it
+        reach_counts = reach_counts * scale
+        distance_sums = distance_sums * scale
+        closeness = np.divide(reach_counts, distance_sums, out=np.zeros(n), where=distance_sums > 0)
+        closeness *= reach_counts / max(n - 1, 1)
+        return closeness, betweenness
+    return cached(adjacency, ('paths', epsilon, delta, seed), compute)
+
+
+def closeness_centrality(adjacency, epsilon=None, delta=0.1, seed=None, processes=None):
+    return path_centralities(adjacency, epsilon, delta, seed, processes)[0]
+
+
+def betweenness_centrality(adjacency, epsilon=None, delta=0.1, seed=None, processes=None):
+    return path_centralities(adjacency, epsilon, delta, seed, processes)[1]
+
+
+def centrality_scores(adjacency, epsilon=None, delta=0.1, seed=None, processes=None, directed=None):
+    directed = sparse_graph.is_directed(adjacency, directed)
+    closeness, betweenness = path_centralities(adjacency, epsilon, delta, seed, processes)
+    return {
+        'DC': degree_centrality(adjacency, directed),
+        'CC': closeness,
+        'BC': betweenness,
+        'EVC': eigenvector_centrality(adjacency, directed),
+        'KC': katz_centrality(adjacency, directed=directed)
+    }
@@ -0,0 +1,117 @@
+import itertools
+import os
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+import instrumentation
+import parallel
+import sparse_graph
+
+cache_path = 'data/communities'
+
+
+def symmetric(adjacency, directed=None):
+    # Louvain works on undirected weights, so replies count in both directions
+    adjacency = sparse.csr_array(adjacency)
+    if sparse_graph.is_directed(adjacency, directed):
+        adjacency = adjacency + adjacency.T
+    return adjacency
+
+
+def integer_graph(adjacency, directed=None):
+    return nx.from_scipy_sparse_array(symmetric(adjacency, directed))
+
+
+def louvain_partition(task):
+    resolution, seed = task
+    # Workers receive the CSR arrays, and each builds its graph once, for all of its tasks
+    if 'graph' not in parallel.shared:
+        parallel.shared['graph'] = integer_graph(parallel.shared['adjacency'], directed=False)
+    graph = parallel.shared['graph']
+    communities = nx.community.louvain_communities(graph, weight='weight', resolution=resolution, seed=seed)
+    # Communities are numbered from the largest one down
+    partition = np.empty(graph.number_of_nodes(), dtype=np.int64)
+    for community, nodes in enumerate(sorted(communities, key=len, reverse=True)):
+        partition[list(nodes)] = community
+    return partition
+
+
+def partition_path(key, resolution, seed):
+    return f"{cache_path}/{key}-{resolution}-{seed}.npy"
+
+
+def modularity(adjacency, partition, resolution=1.0, directed=None):
+    # Q = sum over communities of L_c / m - resolution * (d_c / 2m)^2, on the symmetrized weights,
+    # with self-loops counted twice in the degrees as networkx counts them
+    adjacency = sparse.csr_array(symmetric(adjacency, directed), dtype=np.float64)
+    adjacency = adjacency + sparse.diags_array(adjacency.diagonal(), format='csr')
+    total = adjacency.sum()
+    if total == 0:
+        return 0.0
+    edges = adjacency.tocoo()
+    internal = np.bincount(partition[edges.row], weights=edges.data * (partition[edges.row] == partition[edges.col]))
+    degrees = np.bincount(partition, weights=adjacency.sum(axis=1))
+    return internal.sum() / total - resolution * ((degrees / total) ** 2).sum()
+
+
+def entropy(counts):
+    probabilities = counts[counts > 0] / counts.sum()
+    return -(probabilities * np.log(probabilities)).sum()
+
+
+def normalized_mutual_information(first, second):
+    # Arithmetic mean normalization, I(X; Y) / ((H(X) + H(Y)) / 2)
+    n = len(first)
+    contingency = sparse.coo_array((np.ones(n), (first, second))).tocsr()
+    contingency.sum_duplicates()
+    rows = np.asarray(contingency.sum(axis=1)).ravel()
+    cols = np.asarray(contingency.sum(axis=0)).ravel()
+    joint = contingency.tocoo()
+    mutual_information = (joint.data / n * np.log(joint.data * n / (rows[joint.row] * cols[joint.col]))).sum()
+    normalization = (entropy(rows) + entropy(cols)) / 2
+    return mutual_information / normalization if normalization > 0 else 1.0
+
+
+def louvain_ensemble(adjacency, resolutions=(0.5, 1.0, 2.0), seeds=range(5), processes=None, directed=None):
+    # Partitions are cached on disk by graph, resolution and seed, only missing ones are computed
+    os.makedirs(cache_path, exist_ok=True)
+    key = sparse_graph.fingerprint(sparse.csr_array(adjacency))
+    tasks = [(resolution, seed) for resolution in resolutions for seed in seeds]
+    partitions = {task: np.load(partition_path(key, *task)) for task in tasks
+                  if os.path.exists(partition_path(key, *task))}
+    missing = [task for task in tasks if task not in partitions]
+    instrumentation.record(nodes=adjacency.shape[0], cached=len(partitions), computed=len(missing))
+    if missing:
+        results = parallel.map_in_pool(louvain_partition, missing, state={'adjacency': symmetric(adjacency, directed)},
+                                       processes=processes)
+        for task, partition in zip(missing, results):
+            np.save(partition_path(key, *task), partition)
+            partitions[task] = partition
+    return partitions
+
+
+def ensemble_summary(adjacency, partitions, directed=None):
+    rows = []
+    for resolution, runs in itertools.groupby(sorted(partitions), key=lambda task: task[0]):
+        runs = [partitions[task] for task in runs]
+        modularities = np.array([modularity(adjacency, partition, resolution, directed) for partition in runs])
+        counts = np.array([partition.max() + 1 for partition in runs])
+        # Stability is the agreement between every pair of seeds
+        agreements = [normalized_mutual_information(first, second) for first, second in itertools.combinations(runs, 2)]
+        rows.append({
+            'resolution': resolution,
+            'runs': len(runs),
+            'modularity': modularities.mean(),
+            'modularity_std': modularities.std(),
+            'communities': counts.mean(),
+            'largest_community': max(np.bincount(partition).max() for partition in runs),
+            'nmi': np.mean(agreements) if agreements else 1.0,
+            'nmi_min': np.min(agreements) if agreements else 1.0
+        })
+    return pd.DataFrame(rows).set_index('resolution')
+
+
+def best_partition(adjacency, partitions, resolution, directed=None):
+    runs = [task for task in partitions if task[0] == resolution]
+    return partitions[max(runs, key=lambda task: modularity(adjacency, partitions[task], resolution, directed))]
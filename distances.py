@@ -0,0 +1,98 @@
+import time
+import numpy as np
+from scipy import sparse, stats
+from scipy.sparse import csgraph
+import parallel
+import sparse_graph
+
+# Upper bound on the number of distances held in memory by one BFS batch
+batch_distances = 2 ** 22
+
+
+def largest_component(adjacency, connection='weak'):
+    _, components = csgraph.connected_components(adjacency, directed=True, connection=connection)
+    nodes = np.flatnonzero(components == np.bincount(components).argmax())
+    return nodes, adjacency[nodes][:, nodes]
+
+
+def source_statistics(sources):
+    adjacency = parallel.shared['adjacency']
+    distances = csgraph.shortest_path(adjacency, directed=True, unweighted=True, indices=sources)
+    reachable = np.isfinite(distances)
+    distances[~reachable] = 0
+    return distances.sum(axis=1), reachable.sum(axis=1) - 1, distances.max(axis=1), distances.argmax(axis=1)
+
+
+def bfs_from(adjacency, sources, processes=None):
+    batch_size = max(batch_distances // max(adjacency.shape[0], 1), 1)
+    results = parallel.map_in_pool(source_statistics, parallel.chunks(np.asarray(sources), batch_size),
+                                   state={'adjacency': adjacency}, processes=processes)
+    if len(results) == 0:
+        empty = np.zeros(0)
+        return empty, empty, empty, empty
+    return tuple(np.concatenate(values) for values in zip(*results))
+
+
+def diameter_bounds(adjacency, directed, sources, reached, eccentricities, farthest):
+    n = adjacency.shape[0]
+    # Double sweep: the node farthest from the most eccentric source is a good candidate for a diameter endpoint
+    sweep_source = farthest[eccentricities.argmax()]
+    _, sweep_reached, sweep_eccentricity, _ = bfs_from(adjacency, [sweep_source], processes=1)
+    lower = max(eccentricities.max(), sweep_eccentricity[0])
+    if (reached < n - 1).any() or sweep_reached[0] < n - 1:
+        # Upper bounds below only hold when every node reaches every other one
+        return lower, np.inf
+    center = sources[eccentricities.argmin()]
+    if directed:
+        # d(u, v) <= d(u, c) + d(c, v) <= in-eccentricity(c) + out-eccentricity(c)
+        _, _, in_eccentricity, _ = bfs_from(adjacency.T.tocsr(), [center], processes=1)
+        upper = eccentricities.min() + in_eccentricity[0]
+    else:
+        upper = 2 * eccentricities.min()
+    return lower, min(upper, n - 1)
+
+
+def distance_statistics(adjacency, component=None, sample_size=None, confidence=0.95, seed=None, processes=None,
+                        directed=None):
+    timings = {}
+    start = time.perf_counter()
+    adjacency = sparse.csr_array(adjacency)
+    directed = sparse_graph.is_directed(adjacency, directed)
+    if component is not None:
+        _, adjacency = largest_component(adjacency, component)
+    timings['component'] = time.perf_counter() - start
+    n = adjacency.shape[0]
+    exact = sample_size is None or sample_size >= n
+    if exact:
+        sources = np.arange(n)
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(n, sample_size, replace=False))
+
+    start = time.perf_counter()
+    totals, reached, eccentricities, farthest = bfs_from(adjacency, sources, processes)
+    timings['bfs'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    average_distance = totals.sum() / max(reached.sum(), 1)
+    if exact:
+        margin = 0.0
+        lower = upper = eccentricities.max() if n > 0 else 0
+    else:
+        # Normal approximation over the per-source mean distances, with finite population correction
+        source_means = totals[reached > 0] / reached[reached > 0]
+        z = stats.norm.ppf((1 + confidence) / 2)
+        margin = z * source_means.std(ddof=1) / np.sqrt(len(source_means)) * np.sqrt((n - len(sources)) / (n - 1))
+        lower, upper = diameter_bounds(adjacency, directed, sources, reached, eccentricities, farthest)
+    timings['estimation'] = time.perf_counter() - start
+
+    return {
+        'nodes': n,
+        'edges': adjacency.nnz if directed else (adjacency.nnz + adjacency.diagonal().astype(bool).sum()) // 2,
+        'sources': len(sources),
+        'exact': exact,
+        'average_distance': average_distance,
+        'average_distance_interval': (average_distance - margin, average_distance + margin),
+        'diameter': lower,
+        'diameter_bounds': (lower, upper),
+        'timings': timings
+    }
@@ -0,0 +1,113 @@
+import hashlib
+import math
+import os
+import numpy as np
+import powerlaw
+from matplotlib.figure import Figure
+from scipy import sparse
+import instrumentation
+import parallel
+import sparse_graph
+
+# Power-law fits already computed, keyed by a hash of the sorted degree sequence and the bootstrap parameters
+cache = {}
+
+
+def degrees(adjacency, weighted=False, directed=None):
+    # Degrees as networkx counts them: in plus out for directed graphs, self-loops twice for undirected ones
+    adjacency = sparse.csr_array(adjacency)
+    values = adjacency if weighted else adjacency.astype(bool).astype(np.int64)
+    if sparse_graph.is_directed(adjacency, directed):
+        return values.sum(axis=1) + values.sum(axis=0)
+    return values.sum(axis=1) + values.diagonal()
+
+
+def edge_weights(adjacency, directed=None):
+    adjacency = sparse.csr_array(adjacency)
+    if sparse_graph.is_directed(adjacency, directed):
+        return adjacency.data
+    # Undirected edges are stored in both directions, the upper triangle holds every edge once
+    return sparse.triu(adjacency, format='csr').data
+
+
+def histogram(values, log_bins=False, bins_per_decade=10):
+    values = np.asarray(values)
+    values = values[values > 0]
+    if len(values) == 0:
+        return np.zeros(0), np.zeros(0)
+    if not log_bins:
+        return np.unique(values, return_counts=True)
+    # Bins of equal width on a log scale, counts are divided by the bin width so that they stay comparable
+    low, high = values.min(), values.max()
+    if low == high:
+        # A single distinct value still gets a bin of nonzero width around it
+        low, high = low / 10 ** (0.5 / bins_per_decade), high * 10 ** (0.5 / bins_per_decade)
+    edges = np.geomspace(low, high, max(math.ceil(math.log10(high / low) * bins_per_decade), 1) + 1)
+    # Round-off can put the outer edges just inside the data range, which np.histogram would then drop
+    edges[0], edges[-1] = low, high
+    counts, edges = np.histogram(values, bins=edges)
+    centers = np.sqrt(edges[:-1] * edges[1:])
+    nonempty = counts > 0
+    return centers[nonempty], (counts / np.diff(edges))[nonempty]
+
+
+def render(x, y, xlabel, path, xscale='linear', yscale='linear'):
+    # Figures are drawn without pyplot, so batch runs never need a display
+    figure = Figure()
+    axes = figure.add_subplot()
+    axes.scatter(x, y, marker='.')
+    axes.set_xlabel(xlabel)
+    axes.set_xscale(xscale)
+    axes.set_ylabel('Frequency')
+    axes.set_yscale(yscale)
+    if len(x) > 0:
+        axes.set_xlim(min(1, x.min()), x.max())
+        axes.set_ylim(min(1, y.min()), y.max())
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    figure.savefig(path)
+    return path
+
+
+def synthetic_distances(seeds):
+    # Kolmogorov-Smirnov distances of data sets drawn from the fitted model, each fitted again from scratch,
+    # with the part below xmin resampled from the observed data (Clauset, Shalizi and Newman, 2009)
+    data, alpha, xmin = parallel.shared['data'], parallel.shared['alpha'], parallel.shared['xmin']
+    below = data[data < xmin]
+    distances = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        tail_size = rng.binomial(len(data), 1 - len(below) / len(data))
+        tail = xmin * (1 - rng.random(tail_size)) ** (-1 / (alpha - 1))
+        sample = np.concatenate([tail, rng.choice(below, len(data) - tail_size)]) if len(below) else tail
+        distances.append(powerlaw.Fit(sample, verbose=False).power_law.D)
+    return distances
+
+
+def powerlaw_fit(values, samples=100, seed=None, processes=None):
+    data = np.sort(np.asarray(values, dtype=np.float64))
+    data = data[data > 0]
+    key = (hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest(), samples, seed)
+    if key in cache:
+        instrumentation.count('cache_hits')
+        return cache[key]
+    instrumentation.count('cache_misses')
+    fit = powerlaw.Fit(data, verbose=False)
+    ratio, significance = fit.distribution_compare('power_law', 'exponential')
+    seeds = np.random.default_rng(seed).integers(2 ** 63, size=samples)
+    chunk_size = max(math.ceil(samples / (4 * (processes or os.cpu_count() or 1))), 1)
+    results = parallel.map_in_pool(synthetic_distances, parallel.chunks(seeds, chunk_size),
+                                   state={'data': data, 'alpha': fit.power_law.alpha, 'xmin': fit.power_law.xmin},
+                                   processes=processes)
+    distances = np.concatenate([np.zeros(0)] + [np.asarray(result) for result in results])
+    cache[key] = {
+        'alpha': fit.power_law.alpha,
+        'xmin': fit.power_law.xmin,
+        'sigma': fit.power_law.sigma,
+        'D': fit.power_law.D,
+        # Share of the synthetic data sets fitting the model worse than the observed one
+        'p_value': (distances >= fit.power_law.D).mean() if samples > 0 else np.nan,
+        'samples': samples,
+        'loglikelihood_ratio': ratio,
+        'significance': significance
+    }
+    return cache[key]
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import networkx as nx
+import numpy as np
+from scipy import sparse
+import sparse_graph
+
+# A graph is stored as a directory holding its node labels, one per line, and its
+# adjacency in CSR form: row offsets, column targets and edge weights as .npy arrays.
+# Undirected graphs keep both directions of every edge, so loading never needs to symmetrize.
+
+
+def write_graph(path, labels, adjacency, directed):
+    adjacency = sparse.csr_array(adjacency)
+    adjacency.sum_duplicates()
+    os.makedirs(path, exist_ok=True)
+    # Files are written next to the graph and then moved over the old ones, so adjacencies
+    # read before keep mapping the old files instead of seeing them rewritten in place
+    staging = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.staging-')
+    with open(f"{staging}/labels.txt", 'w', encoding='utf-8') as labels_file:
+        labels_file.write('\n'.join(str(label) for label in labels))
+    # Offsets and targets share one index dtype, otherwise scipy would copy them into a common one on load
+    index_dtype = np.int32 if max(adjacency.nnz, adjacency.shape[0]) < 2 ** 31 else np.int64
+    np.save(f"{staging}/offsets.npy", adjacency.indptr.astype(index_dtype))
+    np.save(f"{staging}/targets.npy", adjacency.indices.astype(index_dtype))
+    np.save(f"{staging}/weights.npy", adjacency.data)
+    with open(f"{staging}/meta.json", 'w') as meta_file:
+        json.dump({'nodes': adjacency.shape[0], 'directed': directed}, meta_file)
+    for file in ('labels.txt', 'offsets.npy', 'targets.npy', 'weights.npy', 'meta.json'):
+        os.replace(f"{staging}/{file}", f"{path}/{file}")
+    os.rmdir(staging)
+
+
+def read_graph(path):
+    with open(f"{path}/meta.json") as meta_file:
+        meta = json.load(meta_file)
+    with open(f"{path}/labels.txt", encoding='utf-8') as labels_file:
+        text = labels_file.read()
+    labels = np.empty(meta['nodes'], dtype=object)
+    labels[:] = text.split('\n') if meta['nodes'] > 0 else []
+    # The arrays stay on disk, pages are only read when they are touched
+    offsets = np.load(f"{path}/offsets.npy", mmap_mode='r')
+    targets = np.load(f"{path}/targets.npy", mmap_mode='r')
+    weights = np.load(f"{path}/weights.npy", mmap_mode='r')
+    adjacency = sparse.csr_array((weights, targets, offsets), shape=(meta['nodes'], meta['nodes']), copy=False)
+    return labels, adjacency, meta['directed']
+
+
+def write_networkx(graph, path):
+    labels, adjacency = sparse_graph.from_networkx(graph)
+    write_graph(path, labels, adjacency, graph.is_directed())
+
+
+def read_networkx(path):
+    labels, adjacency, directed = read_graph(path)
+    return sparse_graph.to_networkx(labels, adjacency, directed)
+
+
+def convert_gml(gml_path, path):
+    write_networkx(nx.read_gml(gml_path), path)
+
+
+def export_gml(path, gml_path):
+    nx.write_gml(read_networkx(path), gml_path)
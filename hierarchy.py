@@ -0,0 +1,126 @@
+import heapq
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+
+def find(parents, node):
+    root = node
+    while parents[root] != root:
+        root = parents[root]
+    # Path compression
+    while parents[node] != root:
+        parents[node], node = root, parents[node]
+    return root
+
+
+def join_remaining(linkage, sizes, roots, n):
+    # Clusters with no edges between them are joined last, smallest first
+    roots = sorted(roots, key=lambda cluster: sizes[cluster])
+    while len(roots) > 1:
+        i, j = roots.pop(0), roots.pop(0)
+        cluster = n + len(linkage)
+        sizes[cluster] = sizes[i] + sizes[j]
+        linkage.append([i, j, len(linkage) + 1, sizes[cluster]])
+        roots.append(cluster)
+        roots.sort(key=lambda cluster: sizes[cluster])
+    return np.array(linkage, dtype=np.float64).reshape(-1, 4)
+
+
+def greedy_modularity_linkage(adjacency):
+    # Clauset-Newman-Moore agglomeration: repeatedly merge the two adjacent clusters
+    # whose merge increases (or least decreases) weighted modularity
+    adjacency = sparse.csr_array(adjacency, dtype=np.float64)
+    adjacency = (adjacency + adjacency.T) / 2
+    n = adjacency.shape[0]
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    m = degrees.sum() / 2
+    linkage = []
+    sizes = {cluster: 1 for cluster in range(n)}
+    strengths = {cluster: degrees[cluster] for cluster in range(n)}
+    neighbors = {cluster: dict(zip(adjacency.indices[adjacency.indptr[cluster]:adjacency.indptr[cluster + 1]].tolist(),
+                                   adjacency.data[adjacency.indptr[cluster]:adjacency.indptr[cluster + 1]].tolist()))
+                 for cluster in range(n)}
+
+    def gain(i, j, weight):
+        return weight / m - strengths[i] * strengths[j] / (2 * m * m)
+
+    heap = [(-gain(i, j, weight), i, j) for i in range(n) for j, weight in neighbors[i].items() if i < j]
+    heapq.heapify(heap)
+    while heap:
+        _, i, j = heapq.heappop(heap)
+        # Clusters get a fresh id on every merge, so an entry is stale exactly when one side is gone
+        if i not in neighbors or j not in neighbors:
+            continue
+        cluster = n + len(linkage)
+        sizes[cluster] = sizes[i] + sizes[j]
+        strengths[cluster] = strengths.pop(i) + strengths.pop(j)
+        linkage.append([i, j, len(linkage) + 1, sizes[cluster]])
+        merged = neighbors.pop(i)
+        for neighbor, weight in neighbors.pop(j).items():
+            merged[neighbor] = merged.get(neighbor, 0) + weight
+        merged.pop(i, None)
+        merged.pop(j, None)
+        neighbors[cluster] = merged
+        for neighbor, weight in merged.items():
+            neighbor_weights = neighbors[neighbor]
+            neighbor_weights.pop(i, None)
+            neighbor_weights.pop(j, None)
+            neighbor_weights[cluster] = weight
+            heapq.heappush(heap, (-gain(cluster, neighbor, weight), neighbor, cluster))
+    return join_remaining(linkage, sizes, list(neighbors), n)
+
+
+def girvan_newman_linkage(graph):
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    n = len(nodes)
+    # Every connected component is kept as a graph of its own, since removing an edge
+    # only changes the shortest paths, and so the betweenness, inside its component.
+    # That is all the saving there is in the removals: the edge of highest betweenness is
+    # on the shortest paths from most sources, so the component's betweenness has to be
+    # recomputed after every removal, and this stays O(m^2 n) like girvan_newman itself.
+    # What this mode makes cheap is building the linkage from the recorded splits.
+    component_of = {}
+    betweenness = {}
+
+    def add_component(component):
+        for node in component:
+            component_of[node] = component
+        betweenness[id(component)] = nx.edge_betweenness_centrality(component, normalized=False)
+
+    for component in nx.connected_components(graph):
+        add_component(nx.Graph(graph.subgraph(component)))
+    splits = []
+    while True:
+        candidates = [max(values.items(), key=lambda item: item[1]) for values in betweenness.values() if values]
+        if len(candidates) == 0:
+            break
+        (u, v), _ = max(candidates, key=lambda item: item[1])
+        component = component_of[u]
+        component.remove_edge(u, v)
+        component_u = nx.node_connected_component(component, u)
+        if v in component_u:
+            betweenness[id(component)] = nx.edge_betweenness_centrality(component, normalized=False)
+            continue
+        del betweenness[id(component)]
+        add_component(component.subgraph(component_u).copy())
+        add_component(component.subgraph(set(component) - component_u).copy())
+        splits.append((index[u], index[v]))
+
+    # Undoing the splits in reverse order yields the merges, from the finest partition up
+    parents = list(range(n))
+    clusters = list(range(n))
+    sizes = {cluster: 1 for cluster in range(n)}
+    linkage = []
+    for u, v in reversed(splits):
+        root_u, root_v = find(parents, u), find(parents, v)
+        cluster = n + len(linkage)
+        sizes[cluster] = sizes[clusters[root_u]] + sizes[clusters[root_v]]
+        linkage.append([clusters[root_u], clusters[root_v], len(linkage) + 1, sizes[cluster]])
+        parents[root_v] = root_u
+        clusters[root_u] = cluster
+    roots = {clusters[find(parents, node)] for node in range(n)}
+    return join_remaining(linkage, sizes, list(roots), n)
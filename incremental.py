@@ -0,0 +1,334 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from scipy import sparse
+import graph_store
+import main
+
+state_path = 'data/incremental_state'
+
+
+class Encoder:
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self.codes = {label: code for code, label in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def encode(self, values):
+        # Only the distinct values of the delta are looked up, every one of them once
+        value_codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        unique_codes = np.empty(len(uniques), dtype=np.int64)
+        for i, label in enumerate(uniques):
+            code = self.codes.get(label)
+            if code is None:
+                code = self.codes[label] = len(self.labels)
+                self.labels.append(label)
+            unique_codes[i] = code
+        return unique_codes[value_codes]
+
+    def array(self):
+        labels = np.empty(len(self.labels), dtype=object)
+        labels[:] = self.labels
+        return labels
+
+
+class SortedRuns:
+    # Keys, and optionally a value for each of them, kept on disk as sorted runs of .npy files.
+    # A delta is written as a run of its own and the newest runs are merged while they are of
+    # similar size, so every key is rewritten O(log n) times and lookups are binary searches
+    # over the memory-mapped runs, whatever the number of keys stored before. Runs are never
+    # rewritten: the live ones are listed in the state's meta.json, and merges write new runs
+    # that only replace the merged ones there once the state is saved.
+    def __init__(self, path, runs=(), values=False):
+        self.path = path
+        self.values = values
+        self.runs = list(runs)
+        os.makedirs(path, exist_ok=True)
+        self.clean()
+        self.next_run = max(self.runs, default=-1) + 1
+
+    def clean(self):
+        # Runs that are not live were merged away, or written by an update that was never saved
+        for name in os.listdir(self.path):
+            if int(name[4:9]) not in self.runs:
+                os.remove(f"{self.path}/{name}")
+
+    def load(self, run, part):
+        return np.load(f"{self.path}/run-{run:05d}-{part}.npy", mmap_mode='r')
+
+    def write(self, keys, values):
+        run = self.next_run
+        self.next_run += 1
+        np.save(f"{self.path}/run-{run:05d}-keys.npy", keys)
+        if self.values:
+            np.save(f"{self.path}/run-{run:05d}-values.npy", values)
+        return run
+
+    def size(self, run):
+        return len(self.load(run, 'keys'))
+
+    def append(self, keys, values=None):
+        if len(keys) == 0:
+            return
+        order = np.argsort(keys, kind='stable')
+        self.runs.append(self.write(np.asarray(keys, dtype=np.int64)[order],
+                                    np.asarray(values, dtype=np.int64)[order] if self.values else None))
+        while len(self.runs) > 1 and 2 * self.size(self.runs[-1]) >= self.size(self.runs[-2]):
+            older, newer = self.runs[-2:]
+            keys = np.concatenate([self.load(older, 'keys'), self.load(newer, 'keys')])
+            # A stable sort keeps the entries of the older run first among equal keys
+            order = np.argsort(keys, kind='stable')
+            values = np.concatenate([self.load(older, 'values'), self.load(newer, 'values')])[order] \
+                if self.values else None
+            self.runs[-2:] = [self.write(keys[order], values)]
+
+    def lookup(self, keys):
+        # Whether every key is stored, and the value stored with it first
+        keys = np.asarray(keys, dtype=np.int64)
+        found = np.zeros(len(keys), dtype=bool)
+        values = np.full(len(keys), -1, dtype=np.int64)
+        for run in self.runs:
+            run_keys = self.load(run, 'keys')
+            positions = np.minimum(np.searchsorted(run_keys, keys), len(run_keys) - 1)
+            hits = ~found & (run_keys[positions] == keys)
+            if self.values:
+                values[hits] = self.load(run, 'values')[positions[hits]]
+            found |= hits
+        return found, values
+
+    def ranges(self, starts, ends):
+        # Every stored key in [starts[i], ends[i]) for some i, and the values stored with them
+        keys, values = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        for run in self.runs:
+            run_keys = self.load(run, 'keys')
+            first, last = np.searchsorted(run_keys, starts), np.searchsorted(run_keys, ends)
+            counts = last - first
+            positions = np.arange(counts.sum()) + np.repeat(first - np.cumsum(counts) + counts, counts)
+            keys.append(np.asarray(run_keys[positions]))
+            if self.values:
+                values.append(np.asarray(self.load(run, 'values')[positions]))
+        return np.concatenate(keys), np.concatenate(values)
+
+
+def valid(values, pattern):
+    # Missing values come in as NaN, they are no more valid than malformed ones
+    return pd.Series(values, dtype=object).str.fullmatch(pattern).fillna(False).to_numpy(bool)
+
+
+def id_keys(ids, kinds):
+    # Reddit ids are base36 numbers, prefixed with t3_ for submissions and t1_ for comments.
+    # Callers only pass ids matching id_pattern, which keeps the keys within int64.
+    numbers = np.fromiter((int(value, 36) for value in ids), dtype=np.int64, count=len(ids))
+    return numbers * 2 + (np.asarray(kinds) == 't1_')
+
+
+def resized(adjacency, n):
+    # New nodes come without edges, so their rows are empty and the arrays only need a longer indptr
+    indptr = np.concatenate([adjacency.indptr, np.full(n - adjacency.shape[0], adjacency.indptr[-1])])
+    return sparse.csr_array((adjacency.data, adjacency.indices, indptr), shape=(n, n))
+
+
+id_pattern = '[0-9a-z]{1,11}'
+parent_pattern = f"t[13]_{id_pattern}"
+
+
+class GraphState:
+    # The state lives in a directory: the ingested files, SNet and UserNet in the graph store, whose
+    # labels are the codes of subreddits and authors, and three sorted run stores. Loading it reads the
+    # graphs, which are written out anyway, but never anything proportional to the whole corpus.
+    # Every save writes a new generation of the graphs and switches meta.json over to it, so a state
+    # is only ever read back as it was after its last complete save.
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(f"{path}/meta.json"):
+            with open(f"{path}/meta.json") as meta_file:
+                meta = json.load(meta_file)
+            subreddits, self.snet, _ = graph_store.read_graph(f"{self.graphs_path(meta['generation'])}/snet")
+            authors, self.usernet, _ = graph_store.read_graph(f"{self.graphs_path(meta['generation'])}/usernet")
+        else:
+            meta = {'generation': 0, 'files': [], 'runs': {}}
+            subreddits, authors = (), ()
+            self.snet = sparse.csr_array((0, 0), dtype=np.int64)
+            self.usernet = sparse.csr_array((0, 0), dtype=np.int64)
+        self.generation = meta['generation']
+        self.files = meta['files']
+        self.subreddits = Encoder(subreddits)
+        self.authors = Encoder(authors)
+        # (author << 32) | subreddit for every (subreddit, author) membership
+        self.memberships = SortedRuns(f"{path}/memberships", meta['runs'].get('memberships', ()))
+        # Author code of every submission and comment seen so far, keyed by id_keys
+        self.authors_by_id = SortedRuns(f"{path}/ids", meta['runs'].get('ids', ()), values=True)
+        # Authors of replies to parents that have not been seen yet, in case they arrive in a later dump
+        self.pending_replies = SortedRuns(f"{path}/pending", meta['runs'].get('pending', ()), values=True)
+
+    def graphs_path(self, generation):
+        return f"{self.path}/graphs-{generation:05d}"
+
+    def stores(self):
+        return {'memberships': self.memberships, 'ids': self.authors_by_id, 'pending': self.pending_replies}
+
+    def resize(self):
+        self.snet = resized(self.snet, len(self.subreddits))
+        self.usernet = resized(self.usernet, len(self.authors))
+
+    def add_memberships(self, subreddit_codes, author_codes):
+        keys = np.unique((author_codes << 32) | subreddit_codes)
+        keys = keys[~self.memberships.lookup(keys)[0]]
+        if len(keys) == 0:
+            return
+        touched_authors, new_columns = np.unique(keys >> 32, return_inverse=True)
+        # Memberships the touched authors already had, before this delta
+        old_keys, _ = self.memberships.ranges(touched_authors << 32, (touched_authors + 1) << 32)
+        old_columns = np.searchsorted(touched_authors, old_keys >> 32)
+        shape = (len(self.subreddits), len(touched_authors))
+        new_incidence = main.incidence_matrix(keys & 0xFFFFFFFF, new_columns, shape)
+        old_incidence = main.incidence_matrix(old_keys & 0xFFFFFFFF, old_columns, shape)
+        # Co-membership gained: pairs of new memberships, and new memberships paired with old ones
+        delta = new_incidence @ new_incidence.T + new_incidence @ old_incidence.T + old_incidence @ new_incidence.T
+        delta = sparse.triu(delta, k=1, format='csr').astype(np.int64)
+        self.snet = self.snet + delta + delta.T
+        self.memberships.append(keys)
+
+    def add_replies(self, keys, author_codes, parent_keys, comment_author_codes):
+        # An id seen again keeps its first author, as it does in a full rebuild
+        keys, first = np.unique(keys, return_index=True)
+        new = ~self.authors_by_id.lookup(keys)[0]
+        keys = keys[new]
+        self.authors_by_id.append(keys, author_codes[first[new]])
+        found, parents = self.authors_by_id.lookup(parent_keys)
+        # Replies that waited for one of the new ids, every parent key only ever arrives once
+        waiting_parents, waiting_children = self.pending_replies.ranges(keys, keys + 1)
+        self.pending_replies.append(parent_keys[~found], comment_author_codes[~found])
+        children = np.concatenate([comment_author_codes[found], waiting_children])
+        parents = np.concatenate([parents[found], self.authors_by_id.lookup(waiting_parents)[1]])
+        n = len(self.authors)
+        self.usernet = self.usernet + sparse.csr_array((np.ones(len(children), dtype=np.int64), (children, parents)),
+                                                       shape=(n, n))
+
+    def update(self, submission_data, comment_data):
+        subreddit_codes = self.subreddits.encode(pd.concat([submission_data['subreddit'], comment_data['subreddit']]))
+        author_codes = self.authors.encode(pd.concat([submission_data['author'], comment_data['author']]))
+        self.resize()
+        self.add_memberships(subreddit_codes, author_codes)
+        # Posts without a valid id can not be replied to, and comments without a valid parent reply to nobody,
+        # as in a full rebuild, but their authors still count as members of the subreddit
+        ids = pd.concat([submission_data['id'], comment_data['id']])
+        has_id = valid(ids, id_pattern)
+        kinds = np.repeat(['t3_', 't1_'], [len(submission_data), len(comment_data)])
+        keys = id_keys(ids[has_id], kinds[has_id])
+        comment_author_codes = author_codes[len(submission_data):]
+        has_parent = valid(comment_data['parent_id'], parent_pattern)
+        parent_ids = comment_data['parent_id'][has_parent]
+        self.add_replies(keys, author_codes[has_id], id_keys(parent_ids.str[3:], parent_ids.str[:3]),
+                         comment_author_codes[has_parent])
+
+    def save(self):
+        generation = self.generation + 1
+        graph_store.write_graph(f"{self.graphs_path(generation)}/snet", self.subreddits.array(), self.snet, False)
+        graph_store.write_graph(f"{self.graphs_path(generation)}/usernet", self.authors.array(), self.usernet, True)
+        meta = {'generation': generation, 'files': self.files,
+                'runs': {name: store.runs for name, store in self.stores().items()}}
+        with open(f"{self.path}/meta.json.tmp", 'w') as meta_file:
+            json.dump(meta, meta_file, indent=2)
+        os.replace(f"{self.path}/meta.json.tmp", f"{self.path}/meta.json")
+        self.generation = generation
+        # Only once meta.json points at the new generation are the older graphs and merged runs out of use
+        for name in os.listdir(self.path):
+            if name.startswith('graphs-') and name != os.path.basename(self.graphs_path(generation)):
+                shutil.rmtree(f"{self.path}/{name}")
+        for store in self.stores().values():
+            store.clean()
+
+
+def empty_frame(columns):
+    return pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+
+
+def write_graphs(state, export_gml=False):
+    # Derived graphs are filtered from the updated weights, none of them goes back to the dataset.
+    # GML exports go through networkx and cost more than everything else here, so refreshes leave them
+    # out unless asked to, and remove the ones they would leave stale; graph_store.export_gml writes
+    # them when they are needed.
+    previous_export_gml, main.export_gml = main.export_gml, export_gml
+    try:
+        main.save_adjacency(state.subreddits.array(), state.snet, 'snet')
+        main.model_snetf_graph('snet')
+        main.extract_dominant_cc('snetf')
+        main.model_snett_graph('snet')
+        main.save_adjacency(state.authors.array(), state.usernet, 'usernet', directed=True)
+    finally:
+        main.export_gml = previous_export_gml
+    if not export_gml:
+        for name in ('snet', 'snetf', 'snetf-dom', 'snett', 'usernet'):
+            if os.path.exists(f"{main.graphs_path}/{name}.gml"):
+                os.remove(f"{main.graphs_path}/{name}.gml")
+
+
+def initialize_state():
+    # The state starts from the cleansed dataset, read once, and holds the files it was built from
+    files = main.dataset_files()
+    if files is None:
+        raise ValueError("The cleansed dataset does not record its files, rebuild it with create_secondary_dataset.")
+    state = GraphState(state_path)
+    state.update(main.load_cleansed_data(main.cleansed_submission_data_path, ['id', 'author', 'subreddit']),
+                 main.load_cleansed_data(main.cleansed_comment_data_path, ['id', 'author', 'subreddit', 'parent_id']))
+    state.files = files
+    state.save()
+    return state
+
+
+def publish(state):
+    # Partitions of a file are staged under the generation that ingests it, and moved into the cleansed
+    # dataset once that generation is saved. Those of an ingest that failed before saving are dropped,
+    # and a publish cut short is finished by the next one.
+    for name in sorted(os.listdir(state.path)):
+        if not name.startswith('staging-'):
+            continue
+        staging_path = f"{state.path}/{name}"
+        if int(name[8:]) > state.generation:
+            shutil.rmtree(staging_path)
+            continue
+        for kind, cleansed_path in (('submissions', main.cleansed_submission_data_path),
+                                    ('comments', main.cleansed_comment_data_path)):
+            partitions = len(os.listdir(cleansed_path))
+            for partition in sorted(os.listdir(f"{staging_path}/{kind}")):
+                os.replace(f"{staging_path}/{kind}/{partition}", f"{cleansed_path}/part-{partitions:05d}.arrow")
+                partitions += 1
+        with open(f"{staging_path}/file.txt") as file_file:
+            file = file_file.read()
+        files = main.dataset_files()
+        if file not in files:
+            main.record_dataset_files(files + [file])
+        shutil.rmtree(staging_path)
+
+
+def ingest_file(file, chunksize=500000, export_gml=False):
+    if os.path.exists(f"{state_path}/meta.json"):
+        state = GraphState(state_path)
+    else:
+        state = initialize_state()
+    publish(state)
+    if file in state.files:
+        raise ValueError(f"{file} has already been ingested.")
+    staging_path = f"{state.path}/staging-{state.generation + 1:05d}"
+    for data_path, kind, columns in ((main.submission_data_path, 'submissions', main.submission_columns),
+                                     (main.comment_data_path, 'comments', main.comment_columns)):
+        os.makedirs(f"{staging_path}/{kind}")
+        for partition, chunk in enumerate(main.cleansed_chunks(f"{data_path}/{file}", columns, chunksize)):
+            main.write_partition(chunk, f"{staging_path}/{kind}", partition)
+            if columns is main.submission_columns:
+                state.update(chunk, empty_frame(main.comment_columns))
+            else:
+                state.update(empty_frame(main.submission_columns), chunk)
+    with open(f"{staging_path}/file.txt", 'w') as file_file:
+        file_file.write(file)
+    state.files.append(file)
+    state.save()
+    publish(state)
+    main.statistics_cache.clear()
+    write_graphs(state, export_gml)
+    return state
@@ -0,0 +1,118 @@
+import atexit
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then left out
+    resource = None
+
+# Setting REDDIT_SNA_PROFILE to a JSON path turns instrumentation on and writes the records there on exit,
+# REDDIT_SNA_PROFILE_DIR additionally dumps a cProfile file per stage
+enabled = False
+profile_directory = None
+records = []
+active_stages = []
+profiling = False
+
+
+def enable(profile_dir=None):
+    global enabled, profile_directory
+    enabled = True
+    profile_directory = profile_dir
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    records.clear()
+    active_stages.clear()
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextlib.contextmanager
+def stage(name):
+    global profiling
+    if not enabled:
+        yield
+        return
+    record = {
+        'stage': name,
+        'parent': active_stages[-1]['stage'] if active_stages else None,
+        'counts': {}
+    }
+    # Only one profiler can run at a time, nested stages are part of their outermost stage's profile
+    profiler = None
+    if profile_directory is not None and not profiling:
+        profiler = cProfile.Profile()
+        profiling = True
+    rss_before = peak_rss()
+    active_stages.append(record)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiling = False
+            profiler.dump_stats(f"{profile_directory}/{len(records):04d}-{name}.prof")
+        record['wall_time'] = time.perf_counter() - wall_start
+        record['cpu_time'] = time.process_time() - cpu_start
+        record['peak_rss'] = peak_rss()
+        record['peak_rss_growth'] = None if rss_before is None else record['peak_rss'] - rss_before
+        active_stages.pop()
+        records.append(record)
+
+
+def instrumented(function=None, name=None):
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with stage(stage_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator if function is None else decorator(function)
+
+
+def record(**counts):
+    # Row, node and edge counts of the innermost running stage
+    if enabled and active_stages:
+        active_stages[-1]['counts'].update({name: int(value) for name, value in counts.items()})
+
+
+def count(name, increment=1):
+    if enabled and active_stages:
+        counts = active_stages[-1]['counts']
+        counts[name] = counts.get(name, 0) + increment
+
+
+def export_json(path):
+    with open(path, 'w') as output_file:
+        json.dump(records, output_file, indent=2)
+
+
+if os.environ.get('REDDIT_SNA_PROFILE'):
+    enable(os.environ.get('REDDIT_SNA_PROFILE_DIR'))
+    atexit.register(export_json, os.environ['REDDIT_SNA_PROFILE'])
@@ -0,0 +1,69 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def warm_start(labels, previous, n):
+    # Scores of nodes already seen are reused, new nodes start from the mean of the previous scores
+    if previous is None:
+        return np.full(n, 1.0 / n)
+    previous_labels, previous_scores = previous
+    positions = pd.Index(previous_labels).get_indexer(labels)
+    start = np.where(positions >= 0, np.asarray(previous_scores)[np.maximum(positions, 0)], np.mean(previous_scores))
+    total = start.sum()
+    return start / total if total > 0 else np.full(n, 1.0 / n)
+
+
+def hits(adjacency, labels=None, previous=None, tolerance=1e-8, max_iterations=1000):
+    adjacency = sparse.csr_array(adjacency, dtype=np.float64)
+    transposed = adjacency.T.tocsr()
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0), np.zeros(0), 0
+    hubs = warm_start(labels, previous, n)
+    for iteration in range(1, max_iterations + 1):
+        hubs_last = hubs
+        authorities = transposed @ hubs_last
+        hubs = adjacency @ authorities
+        total = hubs.sum()
+        hubs = hubs / total if total > 0 else np.full(n, 1.0 / n)
+        if np.abs(hubs - hubs_last).sum() < n * tolerance:
+            break
+    else:
+        raise nx.PowerIterationFailedConvergence(max_iterations)
+    authorities = transposed @ hubs
+    total = authorities.sum()
+    authorities = authorities / total if total > 0 else np.full(n, 1.0 / n)
+    return hubs, authorities, iteration
+
+
+def pagerank(adjacency, alpha=0.85, labels=None, previous=None, personalization=None, tolerance=1e-6,
+             max_iterations=100):
+    adjacency = sparse.csr_array(adjacency, dtype=np.float64)
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0), 0
+    out_weights = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weights == 0
+    # Row-stochastic transition matrix, transposed once so every iteration is a single mat-vec
+    transition = (sparse.diags_array(np.divide(1.0, out_weights, out=np.zeros(n), where=~dangling)) @ adjacency).T
+    transition = transition.tocsr()
+    teleport = np.full(n, 1.0 / n) if personalization is None else np.asarray(personalization) / np.sum(personalization)
+    scores = warm_start(labels, previous, n)
+    for iteration in range(1, max_iterations + 1):
+        scores_last = scores
+        scores = alpha * (transition @ scores_last + scores_last[dangling].sum() * teleport) + (1 - alpha) * teleport
+        if np.abs(scores - scores_last).sum() < n * tolerance:
+            return scores, iteration
+    raise nx.PowerIterationFailedConvergence(max_iterations)
+
+
+def top_k(labels, scores, k=10):
+    # Partial selection of the k largest, only those k get sorted
+    k = min(k, len(scores))
+    if k == 0:
+        return pd.Series(dtype=np.float64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return pd.Series(scores[top], index=np.asarray(labels)[top])
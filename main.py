@@ -1,13 +1,26 @@
-import collections
-from itertools import chain, combinations
+import functools
 import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
 import os
 import pandas as pd
+from pandas.api.types import union_categoricals
 import pickle
-import powerlaw
+import pyarrow as pa
+from pyarrow import feather
+from scipy import sparse
 from scipy.cluster.hierarchy import dendrogram
+import centrality
+import communities
+import distances
+import distributions
+import graph_store
+import hierarchy
+import instrumentation
+import link_analysis
+import null_models
+import sparse_graph
+import thresholds
 
 submission_data_path = 'data/submissions'
 comment_data_path = 'data/comments'
@@ -15,128 +28,338 @@ cleansed_submission_data_path = 'data/submissions_cleansed/submissions'
 cleansed_comment_data_path = 'data/comments_cleansed/comments'
 graphs_path = 'graphs'
 dendrograms_path = 'dendrograms'
+plots_path = 'plots'
+# GML copies of the binary graphs, for Gephi
+export_gml = True
+# Columns kept in the cleansed dataset, along with their compact dtypes
+submission_columns = {
+    'id': 'object',
+    'author': 'category',
+    'subreddit': 'category',
+    'num_comments': 'int32',
+    'over_18': 'bool',
+    'domain': 'category',
+    'created_utc': 'int64'
+}
+comment_columns = {
+    'id': 'object',
+    'author': 'category',
+    'subreddit': 'category',
+    'parent_id': 'object',
+    'created_utc': 'int64'
+}
+arrow_types = {
+    'object': pa.string(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'int32': pa.int32(),
+    'int64': pa.int64(),
+    'bool': pa.bool_()
+}
+
+
+@instrumentation.instrumented
+def save_adjacency(labels, adjacency, name, directed=False):
+    graph_store.write_graph(f"{graphs_path}/{name}", labels, adjacency, directed)
+    if export_gml:
+        nx.write_gml(sparse_graph.to_networkx(labels, adjacency, directed), f"{graphs_path}/{name}.gml")
+
+
+@instrumentation.instrumented
+def save_graph(graph, name):
+    graph_store.write_networkx(graph, f"{graphs_path}/{name}")
+    if export_gml:
+        nx.write_gml(graph, f"{graphs_path}/{name}.gml")
+
+
+@instrumentation.instrumented
+def load_graph(name):
+    # Graphs saved before the binary store only exist as GML
+    if os.path.isdir(f"{graphs_path}/{name}"):
+        return graph_store.read_networkx(f"{graphs_path}/{name}")
+    return nx.read_gml(f"{graphs_path}/{name}.gml")
+
+
+@instrumentation.instrumented
+def load_adjacency(name):
+    if os.path.isdir(f"{graphs_path}/{name}"):
+        return graph_store.read_graph(f"{graphs_path}/{name}")
+    graph = nx.read_gml(f"{graphs_path}/{name}.gml")
+    return (*sparse_graph.from_networkx(graph), graph.is_directed())
+
+
+def graph_adjacency(graph):
+    # Analyses take the name of a stored graph, or a networkx graph as they always did
+    if isinstance(graph, str):
+        return load_adjacency(graph)
+    return (*sparse_graph.from_networkx(graph), graph.is_directed())
+
+
+def networkx_graph(graph):
+    return load_graph(graph) if isinstance(graph, str) else graph
+
+
+def cleansed_chunks(path, columns, chunksize=None):
+    data = pd.read_csv(path, usecols=lambda column: column in columns, dtype=columns, chunksize=chunksize)
+    for chunk in ([data] if chunksize is None else data):
+        chunk = chunk[chunk['author'] != '[deleted]']
+        chunk['author'] = chunk['author'].cat.remove_unused_categories()
+        yield chunk
+
+
+def write_partition(chunk, path, index):
+    schema = pa.schema([(column, arrow_types[dtype])
+                        for column, dtype in {**submission_columns, **comment_columns}.items()
+                        if column in chunk.columns])
+    table = pa.Table.from_pandas(chunk, preserve_index=False).select(schema.names).cast(schema)
+    # Uncompressed partitions can be memory-mapped without decoding
+    feather.write_feather(table, f"{path}/part-{index:05d}.arrow", compression='uncompressed')
+
+
+def dataset_files_path():
+    # Next to the submission partitions, so that readers of the partitions never come across it
+    return f"{os.path.dirname(cleansed_submission_data_path)}/files.txt"
+
+
+def dataset_files():
+    # Raw files the cleansed dataset was built from, None for datasets that do not record them
+    if not os.path.exists(dataset_files_path()):
+        return None
+    with open(dataset_files_path()) as files_file:
+        return files_file.read().split()
+
+
+def record_dataset_files(files):
+    with open(f"{dataset_files_path()}.tmp", 'w') as files_file:
+        files_file.write(''.join(f"{file}\n" for file in files))
+    os.replace(f"{dataset_files_path()}.tmp", dataset_files_path())
+
+
+@instrumentation.instrumented
+def create_secondary_dataset(chunksize=500000):
+    # Every cleansed chunk is written out as its own partition,
+    # so at most one chunk of one file is held in memory at a time
+    if os.path.exists(dataset_files_path()):
+        os.remove(dataset_files_path())
+    for path in (cleansed_submission_data_path, cleansed_comment_data_path):
+        # A pickle file from before the partitioned format is rebuilt as a partition directory
+        if os.path.isfile(path):
+            os.remove(path)
+        os.makedirs(path, exist_ok=True)
+        for partition in os.listdir(path):
+            os.remove(f"{path}/{partition}")
+    files = sorted(os.listdir(submission_data_path))
+    instrumentation.record(files=len(files))
+    submission_partitions = 0
+    comment_partitions = 0
+    for file in files:
+        for chunk in cleansed_chunks(f"{submission_data_path}/{file}", submission_columns, chunksize):
+            write_partition(chunk, cleansed_submission_data_path, submission_partitions)
+            submission_partitions += 1
+        for chunk in cleansed_chunks(f"{comment_data_path}/{file}", comment_columns, chunksize):
+            write_partition(chunk, cleansed_comment_data_path, comment_partitions)
+            comment_partitions += 1
+    record_dataset_files(files)
+    statistics_cache.clear()
+
+
+def load_pickled_data(path, columns=None):
+    chunks = []
+    with open(path, 'rb') as cleansed_data:
+        while True:
+            try:
+                chunk = pickle.load(cleansed_data)
+                chunks.append(chunk if columns is None else chunk[columns])
+            except EOFError:
+                break
+    if len(chunks) == 0:
+        return pd.DataFrame()
+    data = pd.concat(chunks, ignore_index=True)
+    # Chunks carry their own categories, for which pd.concat falls back to object dtype
+    for column in data.columns:
+        if all(isinstance(chunk[column].dtype, pd.CategoricalDtype) for chunk in chunks):
+            data[column] = union_categoricals([chunk[column] for chunk in chunks])
+    return data
+
+
+@instrumentation.instrumented
+def load_cleansed_data(path, columns=None):
+    # Cleansed datasets written before the columnar format are pickle files
+    if os.path.isfile(path):
+        return load_pickled_data(path, columns)
+    tables = [feather.read_table(f"{path}/{partition}", columns=columns, memory_map=True)
+              for partition in sorted(os.listdir(path))]
+    if len(tables) == 0:
+        return pd.DataFrame(columns=columns)
+    data = pa.concat_tables(tables).unify_dictionaries().to_pandas()
+    instrumentation.record(rows=len(data), columns=len(data.columns))
+    return data
+
+
+def encode_columns(*columns):
+    # Codes are shared across all the columns, and only observed values get one
+    codes, uniques = pd.factorize(union_categoricals([column.astype('category') for column in columns],
+                                                     ignore_order=True))
+    return codes, np.asarray(uniques)
+
+
+def incidence_matrix(row_codes, column_codes, shape):
+    incidence = sparse.csr_array((np.ones(len(row_codes), dtype=np.int32), (row_codes, column_codes)), shape=shape)
+    # Duplicate entries are summed up, but a user is active on a subreddit only once
+    incidence.data[:] = 1
+    return incidence
+
+
+class DatasetStatistics:
+    def __init__(self):
+        submission_data = load_cleansed_data(cleansed_submission_data_path, ['author', 'subreddit'])
+        comment_data = load_cleansed_data(cleansed_comment_data_path, ['author', 'subreddit'])
+        self.number_of_submissions = len(submission_data)
+        # Submissions come first in the encoded columns, comments follow
+        self.subreddit_codes, self.subreddits = \
+            encode_columns(submission_data['subreddit'], comment_data['subreddit'])
+        self.author_codes, self.authors = encode_columns(submission_data['author'], comment_data['author'])
+
+    @functools.cached_property
+    def submission_data(self):
+        # Only the submission queries need these columns, and rows come in the same order as the encoded ones
+        return load_cleansed_data(cleansed_submission_data_path,
+                                  ['id', 'subreddit', 'num_comments', 'over_18', 'domain'])
+
+    @functools.cached_property
+    def incidence(self):
+        return incidence_matrix(self.subreddit_codes, self.author_codes, (len(self.subreddits), len(self.authors)))
+
+    @functools.cached_property
+    def users_by_subreddit(self):
+        return np.diff(self.incidence.indptr)
+
+    @functools.cached_property
+    def subreddits_by_user(self):
+        return np.bincount(self.incidence.indices, minlength=len(self.authors))
+
+    @functools.cached_property
+    def submissions_by_user(self):
+        return np.bincount(self.author_codes[:self.number_of_submissions], minlength=len(self.authors))
+
+    @functools.cached_property
+    def comments_by_user(self):
+        return np.bincount(self.author_codes[self.number_of_submissions:], minlength=len(self.authors))
+
+    def top(self, values, labels, index_name, column_name, k=5):
+        df = pd.DataFrame({column_name: values}, index=pd.Index(labels, name=index_name))
+        return df.nlargest(k, column_name)
+
+    def number_of_unique_subreddits(self):
+        return len(self.subreddits)
+
+    def subreddits_with_most_users(self, k=5):
+        return self.top(self.users_by_subreddit, self.subreddits, 'subreddit', 'number_of_authors', k)
+
+    def subreddits_with_most_comments(self, k=5):
+        submission_subreddit_codes = self.subreddit_codes[:self.number_of_submissions]
+        num_comments = np.bincount(submission_subreddit_codes, weights=self.submission_data['num_comments'],
+                                   minlength=len(self.subreddits)).astype(np.int64)
+        has_submissions = np.bincount(submission_subreddit_codes, minlength=len(self.subreddits)) > 0
+        return self.top(num_comments[has_submissions], self.subreddits[has_submissions],
+                        'subreddit', 'num_comments', k)
+
+    def mean_number_of_subreddit_users(self):
+        return self.users_by_subreddit.mean()
+
+    def users_with_most_submissions(self, k=5):
+        mask = self.submissions_by_user > 0
+        return self.top(self.submissions_by_user[mask], self.authors[mask], 'author', 'number_of_submissions', k)
+
+    def users_with_most_comments(self, k=5):
+        mask = self.comments_by_user > 0
+        return self.top(self.comments_by_user[mask], self.authors[mask], 'author', 'number_of_comments', k)
+
+    def users_active_on_most_subreddits(self, k=5):
+        return self.top(self.subreddits_by_user, self.authors, 'author', 'number_of_subreddits', k)
+
+    def pearson_correlation_coefficient(self):
+        df = pd.DataFrame({'number_of_submissions': self.submissions_by_user.astype(np.float64),
+                           'number_of_comments': self.comments_by_user.astype(np.float64)},
+                          index=pd.Index(self.authors, name='author'))
+        return df.corr()
+
+    def submissions_with_most_comments(self, k=5):
+        submission_data = self.submission_data[self.submission_data['over_18'] == False]
+        return submission_data[['id', 'subreddit', 'num_comments', 'domain']].nlargest(k, 'num_comments')
+
+    def report(self, k=5):
+        print(f"Number of unique subreddits: {self.number_of_unique_subreddits()}.")
+        print(f"Mean number of subreddit users is: {self.mean_number_of_subreddit_users()}.")
+        print(self.subreddits_with_most_users(k))
+        print(self.subreddits_with_most_comments(k))
+        print(self.users_with_most_submissions(k))
+        print(self.users_with_most_comments(k))
+        print(self.users_active_on_most_subreddits(k))
+        print(self.pearson_correlation_coefficient())
+        print(self.submissions_with_most_comments(k))
+
+
+# Holds the one DatasetStatistics of the process, until the dataset is rebuilt
+statistics_cache = {}
+
+
+def dataset_statistics():
+    if 'statistics' in statistics_cache:
+        instrumentation.count('cache_hits')
+    else:
+        instrumentation.count('cache_misses')
+        statistics_cache['statistics'] = DatasetStatistics()
+    return statistics_cache['statistics']
 
 
-def create_secondary_dataset():
-    submissions_secondary_dataset = pd.DataFrame()
-    comments_secondary_dataset = pd.DataFrame()
-    for file in os.listdir(submission_data_path):
-        submission_data = pd.read_csv(f"{submission_data_path}/{file}")
-        comment_data = pd.read_csv(f"{comment_data_path}/{file}")
-        cleansed_submission_data = \
-            submission_data[submission_data['author'] != '[deleted]']
-        submissions_secondary_dataset = \
-            pd.concat([submissions_secondary_dataset,
-                       cleansed_submission_data])
-        cleansed_comment_data = \
-            comment_data[comment_data['author'] != '[deleted]']
-        comments_secondary_dataset = \
-            pd.concat([comments_secondary_dataset, cleansed_comment_data])
-    with open(cleansed_submission_data_path, 'wb') as cleansed_file:
-        pickle.dump(submissions_secondary_dataset, cleansed_file)
-    with open(cleansed_comment_data_path, 'wb') as cleansed_file:
-        pickle.dump(comments_secondary_dataset, cleansed_file)
+@instrumentation.instrumented
+def statistics_report():
+    dataset_statistics().report()
 
 
+@instrumentation.instrumented
 def number_of_unique_subreddits():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
-        subreddit_data = pd.concat([submission_data['subreddit'], comment_data['subreddit']])
-        print(f"Number of unique subreddits: {subreddit_data.nunique()}.")
+    print(f"Number of unique subreddits: {dataset_statistics().number_of_unique_subreddits()}.")
 
 
+@instrumentation.instrumented
 def subreddits_with_most_users():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
-        users_data = pd.concat([submission_data[['subreddit', 'author']], comment_data[['subreddit', 'author']]])
-        users_by_subreddit = users_data.groupby('subreddit') \
-            .agg('nunique') \
-            .rename(columns={'author': 'number_of_authors'})
-        print(users_by_subreddit.sort_values('number_of_authors', ascending=False).head(5))
+    print(dataset_statistics().subreddits_with_most_users())
 
 
+@instrumentation.instrumented
 def subreddits_with_most_comments():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comments_by_submission = submission_data[['subreddit', 'num_comments']] \
-            .groupby('subreddit') \
-            .agg('sum')
-        print(comments_by_submission.sort_values('num_comments', ascending=False).head(5))
+    print(dataset_statistics().subreddits_with_most_comments())
 
 
+@instrumentation.instrumented
 def mean_number_of_subreddit_users():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
-        user_data = pd.concat([submission_data[['subreddit', 'author']], comment_data[['subreddit', 'author']]])
-        users_by_subreddit = user_data.groupby('subreddit') \
-            .agg('nunique') \
-            .rename(columns={'author': 'number_of_authors'})
-        print(f"Mean number of subreddit users is: {users_by_subreddit['number_of_authors'].mean()}.")
+    print(f"Mean number of subreddit users is: {dataset_statistics().mean_number_of_subreddit_users()}.")
 
 
+@instrumentation.instrumented
 def users_with_most_submissions():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        submissions_by_user = submission_data[['id', 'author']] \
-            .groupby('author') \
-            .agg(np.size) \
-            .rename(columns={'id': 'number_of_submissions'})
-        print(submissions_by_user.sort_values('number_of_submissions', ascending=False).head(5))
+    print(dataset_statistics().users_with_most_submissions())
 
 
+@instrumentation.instrumented
 def users_with_most_comments():
-    with open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        comment_data = pickle.load(cleansed_comment_data)
-        comments_by_user = comment_data[['id', 'author']] \
-            .groupby('author') \
-            .agg(np.size) \
-            .rename(columns={'id': 'number_of_comments'})
-        print(comments_by_user.sort_values('number_of_comments', ascending=False).head(5))
+    print(dataset_statistics().users_with_most_comments())
 
 
+@instrumentation.instrumented
 def users_active_on_most_subreddits():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
-        user_data = pd.concat([submission_data[['subreddit', 'author']], comment_data[['subreddit', 'author']]])
-        subreddits_by_user = user_data.groupby('author') \
-            .agg('nunique') \
-            .rename(columns={'subreddit': 'number_of_subreddits'})
-        print(subreddits_by_user.sort_values('number_of_subreddits', ascending=False).head(5))
+    print(dataset_statistics().users_active_on_most_subreddits())
 
 
+@instrumentation.instrumented
 def pearson_correlation_coefficient():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
-        submission_data_filtered = submission_data[['id', 'author']].rename(columns={'id': 'submission_id'})
-        comment_data_filtered = comment_data[['id', 'author']].rename(columns={'id': 'comment_id'})
-        submissions_by_user = submission_data_filtered.groupby('author') \
-            .agg(np.size) \
-            .rename(columns={'submission_id': 'number_of_submissions'})
-        comments_by_user = comment_data_filtered.groupby('author') \
-            .agg(np.size) \
-            .rename(columns={'comment_id': 'number_of_comments'})
-        df = pd.concat([submissions_by_user, comments_by_user], axis=1)
-        df['number_of_submissions'] = df['number_of_submissions'].fillna(0)
-        df['number_of_comments'] = df['number_of_comments'].fillna(0)
-        print(df.corr())
+    print(dataset_statistics().pearson_correlation_coefficient())
 
 
+@instrumentation.instrumented
 def submissions_with_most_comments():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        submission_data_filtered = submission_data[submission_data['over_18'] == False]
-        submission_data_filtered = submission_data_filtered[['id', 'subreddit', 'num_comments', 'domain']]
-        print(submission_data_filtered.sort_values('num_comments', ascending=False).head(5))
+    print(dataset_statistics().submissions_with_most_comments())
 
 
 def active_users(submissions, comments, subreddit):
@@ -145,17 +368,30 @@ def active_users(submissions, comments, subreddit):
     return set(submissions['author'].unique()).union(set(comments['author'].unique()))
 
 
-def model_snet_graph():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
+def snet_edges(incidence, min_common_users=1):
+    # Entry (i, j) of B * B^T is the number of users active on both subreddit i and subreddit j
+    co_membership = sparse.triu(incidence @ incidence.T, k=1, format='coo')
+    mask = co_membership.data >= max(min_common_users, 1)
+    return co_membership.row[mask], co_membership.col[mask], co_membership.data[mask]
+
+
+@instrumentation.instrumented
+def model_snet_graph(method='sparse', min_common_users=1):
+    if method == 'sparse':
+        statistics = dataset_statistics()
+        subreddits, incidence = statistics.subreddits, statistics.incidence
+        rows, cols, weights = snet_edges(incidence, min_common_users)
+        snet_graph = nx.Graph()
+        snet_graph.add_nodes_from(subreddits)
+        snet_graph.add_weighted_edges_from(zip(subreddits[rows], subreddits[cols], weights.tolist()))
+    elif method == 'pairwise':
+        submission_data = load_cleansed_data(cleansed_submission_data_path, ['subreddit', 'author'])
+        comment_data = load_cleansed_data(cleansed_comment_data_path, ['subreddit', 'author'])
         subreddits = set(submission_data['subreddit'].unique())
         subreddits = subreddits.union(set(comment_data['subreddit'].unique()))
         active_users_by_subreddit = {}
         for subreddit in subreddits:
             active_users_by_subreddit[subreddit] = active_users(submission_data, comment_data, subreddit)
-        print(active_users_by_subreddit)
         snet_graph = nx.Graph()
         snet_graph.add_nodes_from(subreddits)
         subreddits_list = list(subreddits)
@@ -166,92 +402,106 @@ def model_snet_graph():
         for subreddit_i, subreddit_j in pairs_of_subreddits:
             weight = len(active_users_by_subreddit[subreddit_i]
                          .intersection(active_users_by_subreddit[subreddit_j]))
-            if weight > 0:
+            if weight >= max(min_common_users, 1):
                 snet_graph.add_edge(subreddit_i, subreddit_j, weight=weight)
-        nx.write_gml(snet_graph, f"{graphs_path}/snet.gml")
-
-
-def clustering_analysis_erdos_renyi(graph):
-    n = graph.number_of_nodes()
-    m = graph.number_of_edges()
-    p = (2 * float(m)) / (n * (n - 1))
-    er_graph = nx.erdos_renyi_graph(n, p)
-    print(f"Avg. Clustering Coefficient: {nx.average_clustering(er_graph)}")
-    er_graph_clustering = nx.clustering(er_graph)
+    else:
+        raise ValueError(f"Unknown SNet construction method: {method}.")
+    instrumentation.record(nodes=snet_graph.number_of_nodes(), edges=snet_graph.number_of_edges())
+    save_graph(snet_graph, 'snet')
+
+
+@instrumentation.instrumented
+def clustering_analysis_erdos_renyi(graph, samples=20, seed=None, processes=None):
+    _, adjacency, _ = graph_adjacency(graph)
+    ensemble = null_models.clustering_ensemble(adjacency, samples=samples, seed=seed, processes=processes)
+    print(f"Avg. Clustering Coefficient: {ensemble['observed']['average_clustering']}")
+    for model in ('gnp', 'configuration'):
+        print(f"Avg. Clustering Coefficient ({model}, {samples} samples): "
+              f"{ensemble[model]['average_clustering']} +/- {ensemble[model]['average_clustering_std']} "
+              f"(z = {ensemble[model]['z_score']})")
+    bins = null_models.histogram_bins
+    width = (bins[1] - bins[0]) / 3
     axs = plt.subplot()
-    axs.hist(er_graph_clustering.values(), bins=10)
+    axs.bar(bins[:-1], ensemble['observed']['histogram'], width=width, align='edge', label='Observed')
+    for offset, model in enumerate(('gnp', 'configuration'), start=1):
+        axs.bar(bins[:-1] + offset * width, ensemble[model]['histogram'], width=width, align='edge',
+                yerr=ensemble[model]['histogram_std'], label=model)
     axs.set_xlabel('Clustering Coefficient')
     axs.set_ylabel('Frequency')
+    axs.legend()
     plt.tight_layout()
     plt.show()
+    return ensemble
 
 
+@instrumentation.instrumented
 def assortative_analysis(graph):
+    graph = networkx_graph(graph)
     # Assortativity coefficient (by node degree)
     print(f"Assortativity coefficient (by node degree): {nx.degree_assortativity_coefficient(graph)}.")
     # Assortativity coefficient (by weighted node degree)
     print(f"Assortativity coefficient (by node degree): {nx.degree_assortativity_coefficient(graph, weight='weight')}.")
 
 
-def draw_degree_histogram(graph, weighted=False, xscale='linear', yscale='linear'):
-    if weighted:
-        degrees = graph.degree(weight='weight')
-    else:
-        degrees = graph.degree()
-    _, degree_list = zip(*degrees)
-    degree_counts = collections.Counter(degree_list)
-    x, y = zip(*degree_counts.items())
-    plt.figure(1)
-    if weighted:
-        plt.xlabel('Weighted Degree')
-    else:
-        plt.xlabel('Degree')
-    plt.xscale(xscale)
-    plt.xlim(1, max(x))
-    plt.ylabel('Frequency')
-    plt.yscale(yscale)
-    plt.ylim(1, max(y))
-    plt.scatter(x, y, marker='.')
-    plt.show()
-
-
-def powerlaw_fit_analysis(graph):
-    degree_sequence = sorted([d for n, d in graph.degree()], reverse=True)
-    results = powerlaw.Fit(degree_sequence)
-    print(results.power_law.alpha)
-    print(results.power_law.xmin)
-    print(results.power_law.sigma)
-    r, p = results.distribution_compare('power_law', 'exponential')
-    print(f"Loglikelihood ratio: {r}")
-    print(f"Statistical significance: {p}")
-
-
-def hits_analysis(graph):
-    hubs, authorities = nx.hits(graph)
-    print(sorted(hubs.items(), key=lambda x: x[1], reverse=True))
-    print(sorted(authorities.items(), key=lambda x: x[1], reverse=True))
-
-
-def extract_dominant_cc(graph):
-    dominant_cc = max(nx.connected_components(graph), key=len)
-    graph_dominant_cc = graph.subgraph(dominant_cc).copy()
-    nx.write_gml(graph_dominant_cc, f"{graphs_path}/snetf-dom.gml")
-
-
-def centrality_analysis(graph):
-    dc_dict = nx.degree_centrality(graph)
-    cc_dict = nx.closeness_centrality(graph)
-    bc_dict = nx.betweenness_centrality(graph)
-    evc_dict = nx.eigenvector_centrality(graph, weight='weight')
-    lambda_max = max(nx.adjacency_spectrum(graph))
-    katz_centrality_dict = nx.katz_centrality(graph, alpha=(1 / (2 * lambda_max)), weight='weight')
+@instrumentation.instrumented
+def draw_degree_histogram(graph, weighted=False, xscale='linear', yscale='linear', log_bins=None, path=None):
+    # Log-scaled degrees are binned logarithmically, unless asked otherwise
+    _, adjacency, directed = graph_adjacency(graph)
+    # Plots of a graph passed in directly have no stored name to go by
+    name = graph if isinstance(graph, str) else 'graph'
+    x, y = distributions.histogram(distributions.degrees(adjacency, weighted, directed),
+                                   log_bins=xscale == 'log' if log_bins is None else log_bins)
+    return distributions.render(x, y, 'Weighted Degree' if weighted else 'Degree',
+                                path or f"{plots_path}/{name}_{'weighted_' if weighted else ''}degree_histogram.png",
+                                xscale, yscale)
+
+
+@instrumentation.instrumented
+def powerlaw_fit_analysis(graph, samples=100, seed=None, processes=None):
+    _, adjacency, directed = graph_adjacency(graph)
+    results = distributions.powerlaw_fit(distributions.degrees(adjacency, directed=directed), samples, seed, processes)
+    print(results['alpha'])
+    print(results['xmin'])
+    print(results['sigma'])
+    print(f"Loglikelihood ratio: {results['loglikelihood_ratio']}")
+    print(f"Statistical significance: {results['significance']}")
+    print(f"Goodness of fit: D = {results['D']}, p = {results['p_value']} ({results['samples']} bootstrap samples)")
+    return results
+
+
+@instrumentation.instrumented
+def hits_analysis(graph='usernet', k=10, previous=None, tolerance=1e-8):
+    # previous is the (labels, hubs) pair returned by an earlier run, on a slightly different graph
+    labels, adjacency, _ = graph_adjacency(graph)
+    hubs, authorities, _ = link_analysis.hits(adjacency, labels=labels, previous=previous, tolerance=tolerance)
+    print(link_analysis.top_k(labels, hubs, k))
+    print(link_analysis.top_k(labels, authorities, k))
+    return labels, hubs
+
+
+@instrumentation.instrumented
+def pagerank_analysis(graph='usernet', k=10, previous=None, alpha=0.85, tolerance=1e-6):
+    labels, adjacency, _ = graph_adjacency(graph)
+    scores, _ = link_analysis.pagerank(adjacency, alpha=alpha, labels=labels, previous=previous, tolerance=tolerance)
+    print(link_analysis.top_k(labels, scores, k))
+    return labels, scores
+
+
+@instrumentation.instrumented
+def extract_dominant_cc(graph='snetf'):
+    labels, adjacency, directed = graph_adjacency(graph)
+    nodes, component = distances.largest_component(adjacency)
+    save_adjacency(labels[nodes], component, 'snetf-dom', directed)
+
+
+@instrumentation.instrumented
+def centrality_analysis(graph, epsilon=None, delta=0.1, processes=None):
+    # epsilon bounds the error of the pivot-sampled closeness and betweenness, None computes them exactly
+    labels, adjacency, directed = graph_adjacency(graph)
+    scores = centrality.centrality_scores(adjacency, epsilon=epsilon, delta=delta, processes=processes,
+                                          directed=directed)
     # Form a DataFrame
-    df1 = pd.DataFrame.from_dict(dc_dict, orient='index', columns=['DC'])
-    df2 = pd.DataFrame.from_dict(cc_dict, orient='index', columns=['CC'])
-    df3 = pd.DataFrame.from_dict(bc_dict, orient='index', columns=['BC'])
-    df4 = pd.DataFrame.from_dict(evc_dict, orient='index', columns=['EVC'])
-    df5 = pd.DataFrame.from_dict(katz_centrality_dict, orient='index', columns=['KC'])
-    df = pd.concat([df1, df2, df3, df4, df5], axis=1)
+    df = pd.DataFrame(scores, index=labels)
     df['composite_rank'] = df['DC'] + df['CC'] + df['BC'] + df['EVC'] + df['KC']
     # Degree centrality
     df_dc = pd.DataFrame({'DC': df['DC']})
@@ -280,149 +530,83 @@ def centrality_analysis(graph):
     return df
 
 
+@instrumentation.instrumented
 def katz_centrality_analysis(graph):
-    lambda_max = max(nx.adjacency_spectrum(graph))
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
-        submission_data_mask = submission_data['subreddit'] == 'reddit.com'
-        reddit_dot_com_submissions = submission_data[submission_data_mask]
-        comment_data_mask = comment_data['subreddit'] == 'reddit.com'
-        reddit_dot_com_comments = comment_data[comment_data_mask]
-        reddit_dot_com_subreddits = set(reddit_dot_com_submissions['subreddit'].unique()) \
-            .union(set(reddit_dot_com_comments['subreddit'].unique()))
-        beta_dict = {}
-        for subreddit in graph.nodes():
-            if subreddit in reddit_dot_com_subreddits:
-                beta_dict[subreddit] = 10.0
-            else:
-                beta_dict[subreddit] = 1.0
-        katz_centrality_dict = nx.katz_centrality(graph, alpha=(1 / (2 * lambda_max)), beta=beta_dict, weight='weight')
-        df_katz_centrality = pd.DataFrame.from_dict(katz_centrality_dict, orient='index', columns=['KC'])
-        df_katz_centrality.sort_values(by='KC', ascending=False, inplace=True)
-        print(df_katz_centrality.head(5))
-
-
-def plot_and_save_dendrogram(G):
+    labels, adjacency, directed = graph_adjacency(graph)
+    # lambda_max is shared with centrality_analysis through the per-graph cache
+    beta = np.where(labels == 'reddit.com', 10.0, 1.0)
+    katz_centrality = centrality.katz_centrality(adjacency,
+                                                 alpha=(1 / (2 * centrality.lambda_max(adjacency, directed))),
+                                                 beta=beta, directed=directed)
+    df_katz_centrality = pd.DataFrame({'KC': katz_centrality}, index=labels)
+    df_katz_centrality.sort_values(by='KC', ascending=False, inplace=True)
+    print(df_katz_centrality.head(5))
+
+
+@instrumentation.instrumented
+def plot_and_save_dendrogram(G, method='greedy'):
     plt.rcParams["figure.figsize"] = (24, 13)
-    # get Girvan-Newman communities list
-    communities = list(nx.community.girvan_newman(G))
-
-    # building initial dict of node_id to each possible subset:
-    node_id = 0
-    init_node2community_dict = {node_id: communities[0][0].union(communities[0][1])}
-    for comm in communities:
-        for subset in list(comm):
-            if subset not in init_node2community_dict.values():
-                node_id += 1
-                init_node2community_dict[node_id] = subset
-
-    # turning this dictionary to the desired format in @mdml's answer
-    node_id_to_children = {e: [] for e in init_node2community_dict.keys()}
-    for node_id1, node_id2 in combinations(init_node2community_dict.keys(), 2):
-        for node_id_parent, group in init_node2community_dict.items():
-            if len(init_node2community_dict[node_id1].intersection(
-                    init_node2community_dict[node_id2])) == 0 and group == init_node2community_dict[node_id1].union(
-                init_node2community_dict[node_id2]):
-                node_id_to_children[node_id_parent].append(node_id1)
-                node_id_to_children[node_id_parent].append(node_id2)
-
-    # also recording node_labels dict for the correct label for dendrogram leaves
-    node_labels = dict()
-    for node_id, group in init_node2community_dict.items():
-        if len(group) == 1:
-            node_labels[node_id] = list(group)[0]
-        else:
-            node_labels[node_id] = ''
-
-    # also needing a subset to rank dict to later know within all k-length merges which came first
-    subset_rank_dict = dict()
-    rank = 0
-    for e in communities[::-1]:
-        for p in list(e):
-            if tuple(p) not in subset_rank_dict:
-                subset_rank_dict[tuple(sorted(p))] = rank
-                rank += 1
-    subset_rank_dict[tuple(sorted(chain.from_iterable(communities[-1])))] = rank
-
-    # my function to get a merge height so that it is unique (probably not that efficient)
-    def get_merge_height(sub):
-        sub_tuple = tuple(sorted([node_labels[i] for i in sub]))
-        n = len(sub_tuple)
-        other_same_len_merges = {k: v for k, v in subset_rank_dict.items() if len(k) == n}
-        min_rank, max_rank = min(other_same_len_merges.values()), max(other_same_len_merges.values())
-        range = (max_rank - min_rank) if max_rank > min_rank else 1
-        return float(len(sub)) + 0.8 * (subset_rank_dict[sub_tuple] - min_rank) / range
-
-    # finally using @mdml's magic, slightly modified:
-    G = nx.DiGraph(node_id_to_children)
-    nodes = G.nodes()
-    leaves = set(n for n in nodes if G.out_degree(n) == 0)
-    inner_nodes = [n for n in nodes if G.out_degree(n) > 0]
-
-    # Compute the size of each subtree
-    subtree = dict((n, [n]) for n in leaves)
-    for u in inner_nodes:
-        children = set()
-        node_list = list(node_id_to_children[u])
-        while len(node_list) > 0:
-            v = node_list.pop(0)
-            children.add(v)
-            node_list += node_id_to_children[v]
-        subtree[u] = sorted(children & leaves)
-
-    inner_nodes.sort(key=lambda n: len(subtree[n]))  # <-- order inner nodes ascending by subtree size, root is last
-
-    # Construct the linkage matrix
-    leaves = sorted(leaves)
-    index = dict((tuple([n]), i) for i, n in enumerate(leaves))
-    Z = []
-    k = len(leaves)
-    for i, n in enumerate(inner_nodes):
-        children = node_id_to_children[n]
-        x = children[0]
-        for y in children[1:]:
-            z = tuple(sorted(subtree[x] + subtree[y]))
-            i, j = index[tuple(sorted(subtree[x]))], index[tuple(sorted(subtree[y]))]
-            Z.append([i, j, get_merge_height(subtree[n]), len(z)])  # <-- float is required by the dendrogram function
-            index[z] = k
-            subtree[z] = list(z)
-            x = z
-            k += 1
+    # Merge heights are the merge order, so the root is the last merge
+    if method == 'greedy':
+        labels, adjacency, _ = graph_adjacency(G)
+        Z = hierarchy.greedy_modularity_linkage(adjacency)
+    elif method == 'girvan_newman':
+        G = networkx_graph(G)
+        labels = list(G.nodes())
+        Z = hierarchy.girvan_newman_linkage(G)
+    else:
+        raise ValueError(f"Unknown dendrogram method: {method}.")
 
     # dendrogram
     plt.figure()
-    dendrogram(Z, labels=[node_labels[node_id] for node_id in leaves])
+    dendrogram(Z, labels=list(labels))
     plt.savefig(f"{dendrograms_path}/dendrogram.png")
 
 
-def draw_edge_weight_histogram(graph):
-    edge_weights = nx.get_edge_attributes(graph, name='weight').values()
-    edge_weight_counts = collections.Counter(edge_weights)
-    x, y = zip(*edge_weight_counts.items())
-    plt.figure(1)
-    plt.xlabel('Edge Weight')
-    plt.xscale('linear')
-    plt.xlim(1, max(x))
-    plt.ylabel('Frequency')
-    plt.yscale('linear')
-    plt.ylim(1, max(y))
-    plt.scatter(x, y, marker='.')
-    plt.show()
-
-
-def model_snetf_graph(snet_graph):
-    w_threshold = 25
-    snetf_graph = snet_graph.copy()
-    snetf_graph.remove_edges_from(
-        [(n1, n2)
-         for n1, n2, w in snet_graph.edges(data='weight')
-         if w < w_threshold])
-    nx.write_gml(snetf_graph, f"{graphs_path}/snetf.gml")
-
-
-def model_snett_graph(snet_graph):
+@instrumentation.instrumented
+def louvain_analysis(graph, resolutions=(0.5, 1.0, 2.0), seeds=range(5), processes=None):
+    labels, adjacency, directed = graph_adjacency(graph)
+    # Symmetrized once, so that the ensemble and its summary all work on the same undirected weights
+    adjacency = communities.symmetric(adjacency, directed)
+    partitions = communities.louvain_ensemble(adjacency, resolutions, seeds, processes, directed=False)
+    summary = communities.ensemble_summary(adjacency, partitions, directed=False)
+    print(summary.to_string())
+    # Largest communities of the best run at the resolution closest to 1
+    resolution = min(resolutions, key=lambda value: abs(value - 1))
+    partition = communities.best_partition(adjacency, partitions, resolution, directed=False)
+    for community, size in enumerate(np.bincount(partition)[:5]):
+        print(f"Community {community} ({size} nodes): {', '.join(map(str, labels[partition == community][:10]))}")
+    return summary
+
+
+@instrumentation.instrumented
+def draw_edge_weight_histogram(graph, xscale='linear', yscale='linear', log_bins=None, path=None):
+    _, adjacency, directed = graph_adjacency(graph)
+    name = graph if isinstance(graph, str) else 'graph'
+    x, y = distributions.histogram(distributions.edge_weights(adjacency, directed),
+                                   log_bins=xscale == 'log' if log_bins is None else log_bins)
+    return distributions.render(x, y, 'Edge Weight', path or f"{plots_path}/{name}_edge_weight_histogram.png",
+                                xscale, yscale)
+
+
+@instrumentation.instrumented
+def model_snetf_graph(graph='snet', w_threshold=25):
+    labels, adjacency, _ = graph_adjacency(graph)
+    edges = thresholds.sorted_edges(adjacency)
+    instrumentation.record(nodes=len(labels), edges=edges.count(w_threshold))
+    save_adjacency(labels, edges.adjacency(w_threshold), 'snetf')
+
+
+@instrumentation.instrumented
+def threshold_sweep(graph='snet'):
+    labels, adjacency, _ = graph_adjacency(graph)
+    index = thresholds.threshold_index(labels, adjacency)
+    print(index.sweep())
+    return index
+
+
+@instrumentation.instrumented
+def model_snett_graph(graph='snet'):
     targeted_subreddits = [
         'reddit.com',
         'pics',
@@ -464,34 +648,64 @@ def model_snett_graph(snet_graph):
         'history',
         'ideas'
     ]
-    snett_graph = snet_graph.subgraph(nodes=targeted_subreddits)
-    nx.write_gml(snett_graph, f"{graphs_path}/snett.gml")
+    labels, adjacency, directed = graph_adjacency(graph)
+    # Targeted subreddits missing from the graph are left out, the others keep their order in it
+    nodes = np.flatnonzero(np.isin(labels, targeted_subreddits))
+    save_adjacency(labels[nodes], adjacency[nodes][:, nodes], 'snett', directed)
+
+
+def parent_author_codes(submission_data, comment_data, submission_author_codes, comment_author_codes):
+    # Hash indexes from submission/comment id to the position of its author code
+    submission_index = pd.Index(submission_data['id']).drop_duplicates()
+    comment_index = pd.Index(comment_data['id']).drop_duplicates()
+    submission_positions = pd.Index(submission_data['id']).get_indexer_for(submission_index)
+    comment_positions = pd.Index(comment_data['id']).get_indexer_for(comment_index)
+    # parent_id is prefixed with t3_ for submissions and t1_ for comments
+    parent_kinds = comment_data['parent_id'].str[:3].to_numpy()
+    parent_ids = comment_data['parent_id'].str[3:]
+    parent_codes = np.full(len(comment_data), -1)
+    for kind, index, positions, codes in (('t3_', submission_index, submission_positions, submission_author_codes),
+                                          ('t1_', comment_index, comment_positions, comment_author_codes)):
+        mask = parent_kinds == kind
+        parents = index.get_indexer(parent_ids[mask])
+        parent_codes[mask] = np.where(parents >= 0, codes[positions[np.maximum(parents, 0)]], -1)
+    return parent_codes
+
+
+@instrumentation.instrumented
+def model_usernet_adjacency():
+    submission_data = load_cleansed_data(cleansed_submission_data_path, ['id', 'author'])
+    comment_data = load_cleansed_data(cleansed_comment_data_path, ['id', 'author', 'parent_id'])
+    author_codes, authors = encode_columns(submission_data['author'], comment_data['author'])
+    comment_author_codes = author_codes[len(submission_data):]
+    parent_codes = parent_author_codes(submission_data, comment_data, author_codes[:len(submission_data)],
+                                       comment_author_codes)
+    replies = parent_codes >= 0
+    # Duplicate (child, parent) entries are summed up, which counts the replies between every pair of users
+    adjacency = sparse.csr_array((np.ones(replies.sum(), dtype=np.int32),
+                                  (comment_author_codes[replies], parent_codes[replies])),
+                                 shape=(len(authors), len(authors)))
+    instrumentation.record(rows=len(comment_data), nodes=len(authors), edges=adjacency.nnz)
+    return authors, adjacency
+
+
+@instrumentation.instrumented
+def model_usernet_graph():
+    authors, adjacency = model_usernet_adjacency()
+    save_adjacency(authors, adjacency, 'usernet', directed=True)
 
 
-def model_usernet_graph():
-    with open(cleansed_submission_data_path, 'rb') as cleansed_submission_data, \
-            open(cleansed_comment_data_path, 'rb') as cleansed_comment_data:
-        submission_data = pickle.load(cleansed_submission_data)
-        comment_data = pickle.load(cleansed_comment_data)
-        authors = pd.concat([submission_data[['id', 'author']],
-                             comment_data[['id', 'author']]])
-        actual_comments_data = comment_data[['author', 'parent_id']]
-        actual_comments_data['parent_id'] = \
-            actual_comments_data['parent_id'].str[3:]
-        usernet_data = actual_comments_data \
-            .merge(authors, left_on='parent_id', right_on='id',
-                   suffixes=('_child', '_parent'))
-        usernet_data = usernet_data[['author_child', 'author_parent']] \
-            .groupby(by=['author_child', 'author_parent']) \
-            .agg(np.size)
-        usernet_graph = nx.DiGraph()
-        usernet_graph.add_nodes_from(set(authors['author'].unique()))
-        for index, value in usernet_data.items():
-            usernet_graph.add_edge(index[0], index[1], weight=value)
-        nx.write_gml(usernet_graph, f"{graphs_path}/usernet.gml")
+@instrumentation.instrumented
+def distance_analysis(graph='usernet', component='strong', sample_size=1000, processes=None):
+    _, adjacency, directed = graph_adjacency(graph)
+    distance_statistics = distances.distance_statistics(adjacency, component=component, sample_size=sample_size,
+                                                        processes=processes, directed=directed)
+    print(f"Average distance: {distance_statistics['average_distance']} "
+          f"({distance_statistics['average_distance_interval']}).")
+    print(f"Diameter: {distance_statistics['diameter_bounds']}.")
+    print(distance_statistics['timings'])
+    return distance_statistics
 
 
 if __name__ == '__main__':
-    usernet_graph = nx.read_gml(f"{graphs_path}/usernet.gml")
-    print(nx.average_shortest_path_length(usernet_graph))
-    print(nx.diameter(usernet_graph))
+    distance_analysis('usernet')
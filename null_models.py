@@ -0,0 +1,94 @@
+import numpy as np
+from scipy import sparse
+import parallel
+
+histogram_bins = np.linspace(0, 1, 11)
+
+
+def simple_adjacency(rows, cols, n):
+    # Undirected, unweighted, without self-loops or multi-edges
+    keep = rows != cols
+    rows, cols = rows[keep], cols[keep]
+    adjacency = sparse.csr_array((np.ones(2 * len(rows)), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+                                 shape=(n, n))
+    adjacency.data[:] = 1
+    return adjacency
+
+
+def gnp_sample(n, p, rng):
+    # Draw the number of edges first, then that many distinct pairs, so the cost is O(n + m) and not O(n^2)
+    pairs = n * (n - 1) // 2
+    m = rng.binomial(pairs, p) if pairs > 0 else 0
+    chosen = np.unique(rng.integers(0, pairs, m)) if m > 0 else np.zeros(0, dtype=np.int64)
+    while len(chosen) < m:
+        chosen = np.unique(np.concatenate([chosen, rng.integers(0, pairs, m - len(chosen))]))
+    # Pair index k enumerates the upper triangle row by row
+    rows = n - 2 - np.floor(np.sqrt(-8 * chosen + 4 * n * (n - 1) - 7) / 2 - 0.5).astype(np.int64)
+    cols = chosen + rows + 1 - n * (n - 1) // 2 + (n - rows) * (n - rows - 1) // 2
+    return simple_adjacency(rows, cols, n)
+
+
+def configuration_sample(degrees, rng):
+    # Erased configuration model: random stub matching, with self-loops and multi-edges dropped
+    stubs = np.repeat(np.arange(len(degrees)), degrees)
+    rng.shuffle(stubs)
+    if len(stubs) % 2 == 1:
+        stubs = stubs[:-1]
+    return simple_adjacency(stubs[0::2], stubs[1::2], len(degrees))
+
+
+def local_clustering(adjacency):
+    adjacency = sparse.csr_array(adjacency, dtype=np.float64)
+    adjacency = adjacency + adjacency.T
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    adjacency.data[:] = 1
+    # (A^2)_ij * A_ij summed over j counts every triangle through i twice
+    triangles = (adjacency @ adjacency).multiply(adjacency).sum(axis=1) / 2
+    degrees = np.diff(adjacency.indptr)
+    possible = degrees * (degrees - 1) / 2
+    return np.divide(triangles, possible, out=np.zeros(len(degrees)), where=possible > 0)
+
+
+def clustering_summary(adjacency):
+    clustering = local_clustering(adjacency)
+    return clustering.mean() if len(clustering) else 0.0, np.histogram(clustering, bins=histogram_bins)[0]
+
+
+def sample_clustering(task):
+    model, seed = task
+    rng = np.random.default_rng(seed)
+    if model == 'gnp':
+        adjacency = gnp_sample(parallel.shared['n'], parallel.shared['p'], rng)
+    elif model == 'configuration':
+        adjacency = configuration_sample(parallel.shared['degrees'], rng)
+    else:
+        raise ValueError(f"Unknown null model: {model}.")
+    return model, clustering_summary(adjacency)
+
+
+def clustering_ensemble(adjacency, samples=20, models=('gnp', 'configuration'), seed=None, processes=None):
+    observed = sparse.csr_array(adjacency)
+    observed = observed + observed.T
+    observed.setdiag(0)
+    observed.eliminate_zeros()
+    n = observed.shape[0]
+    degrees = np.diff(observed.indptr)
+    state = {'n': n, 'p': degrees.sum() / (n * (n - 1)) if n > 1 else 0.0, 'degrees': degrees}
+    seeds = np.random.SeedSequence(seed).generate_state(samples * len(models))
+    tasks = [(model, int(seeds[i * samples + j])) for i, model in enumerate(models) for j in range(samples)]
+    results = parallel.map_in_pool(sample_clustering, tasks, state=state, processes=processes)
+    observed_average, observed_histogram = clustering_summary(observed)
+    summary = {'observed': {'average_clustering': observed_average, 'histogram': observed_histogram}}
+    for model in models:
+        averages = np.array([average for name, (average, _) in results if name == model])
+        histograms = np.array([histogram for name, (_, histogram) in results if name == model])
+        std = averages.std(ddof=1) if len(averages) > 1 else 0.0
+        summary[model] = {
+            'average_clustering': averages.mean(),
+            'average_clustering_std': std,
+            'z_score': (observed_average - averages.mean()) / std if std > 0 else np.nan,
+            'histogram': histograms.mean(axis=0),
+            'histogram_std': histograms.std(axis=0)
+        }
+    return summary
@@ -0,0 +1,24 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Read-only state shared with the worker functions, set once per worker process
+shared = {}
+
+
+def initialize_worker(state):
+    shared.clear()
+    shared.update(state)
+
+
+def map_in_pool(function, tasks, state=None, processes=None):
+    tasks = list(tasks)
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    if processes <= 1:
+        initialize_worker(state or {})
+        return [function(task) for task in tasks]
+    with ProcessPoolExecutor(processes, initializer=initialize_worker, initargs=(state or {},)) as executor:
+        return list(executor.map(function, tasks))
+
+
+def chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), max(size, 1))]
@@ -0,0 +1,296 @@
+import argparse
+import ast
+import contextlib
+import hashlib
+import json
+import os
+import types
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import matplotlib
+
+matplotlib.use('Agg')
+
+import main
+
+cache_path = 'data/pipeline'
+# Module level paths of main.py, handed over to the worker processes
+path_names = ('submission_data_path', 'comment_data_path', 'cleansed_submission_data_path',
+              'cleansed_comment_data_path', 'graphs_path', 'dendrograms_path', 'plots_path', 'export_gml')
+
+
+class Stage:
+    def __init__(self, name, function, inputs, outputs, params=None):
+        self.name = name
+        self.function = function
+        # Files or directories read and written by the stage, dependencies between stages follow from them
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+
+    def log_path(self):
+        return f"{cache_path}/logs/{self.name}.txt"
+
+
+def graph(name):
+    return f"{main.graphs_path}/{name}"
+
+
+def plot(name):
+    return f"{main.plots_path}/{name}_histogram.png"
+
+
+def default_stages():
+    # Built on every call, so that changes to the paths of main.py are picked up
+    cleansed = [main.cleansed_submission_data_path, main.cleansed_comment_data_path]
+    stages = [
+        Stage('cleansed', main.create_secondary_dataset, [main.submission_data_path, main.comment_data_path],
+              cleansed),
+        Stage('snet', main.model_snet_graph, cleansed, [graph('snet')]),
+        Stage('usernet', main.model_usernet_graph, cleansed, [graph('usernet')]),
+        Stage('snetf', main.model_snetf_graph, [graph('snet')], [graph('snetf')],
+              params={'graph': 'snet', 'w_threshold': 25}),
+        Stage('snett', main.model_snett_graph, [graph('snet')], [graph('snett')], params={'graph': 'snet'}),
+        Stage('snetf-dom', main.extract_dominant_cc, [graph('snetf')], [graph('snetf-dom')],
+              params={'graph': 'snetf'}),
+        Stage('statistics', main.statistics_report, cleansed, []),
+        Stage('snet-assortativity', main.assortative_analysis, [graph('snet')], [], params={'graph': 'snet'}),
+        Stage('snet-clustering', main.clustering_analysis_erdos_renyi, [graph('snet')], [],
+              params={'graph': 'snet', 'samples': 20, 'seed': 0, 'processes': 1}),
+        Stage('snet-thresholds', main.threshold_sweep, [graph('snet')], [], params={'graph': 'snet'}),
+        Stage('snetf-dom-centrality', main.centrality_analysis, [graph('snetf-dom')], [],
+              params={'graph': 'snetf-dom', 'processes': 1}),
+        Stage('snetf-dom-katz', main.katz_centrality_analysis, [graph('snetf-dom')], [],
+              params={'graph': 'snetf-dom'}),
+        Stage('snetf-dom-dendrogram', main.plot_and_save_dendrogram, [graph('snetf-dom')],
+              [f"{main.dendrograms_path}/dendrogram.png"], params={'G': 'snetf-dom'}),
+        Stage('usernet-hits', main.hits_analysis, [graph('usernet')], [], params={'graph': 'usernet'}),
+        Stage('usernet-pagerank', main.pagerank_analysis, [graph('usernet')], [], params={'graph': 'usernet'}),
+        Stage('usernet-distances', main.distance_analysis, [graph('usernet')], [],
+              params={'graph': 'usernet', 'processes': 1}),
+        Stage('snet-degree-distribution', main.draw_degree_histogram, [graph('snet')], [plot('snet_degree')],
+              params={'graph': 'snet', 'xscale': 'log', 'yscale': 'log', 'path': plot('snet_degree')}),
+        Stage('snet-weight-distribution', main.draw_edge_weight_histogram, [graph('snet')], [plot('snet_weight')],
+              params={'graph': 'snet', 'xscale': 'log', 'yscale': 'log', 'path': plot('snet_weight')}),
+        Stage('snet-powerlaw', main.powerlaw_fit_analysis, [graph('snet')], [],
+              params={'graph': 'snet', 'samples': 100, 'seed': 0, 'processes': 1}),
+        Stage('usernet-degree-distribution', main.draw_degree_histogram, [graph('usernet')], [plot('usernet_degree')],
+              params={'graph': 'usernet', 'xscale': 'log', 'yscale': 'log', 'path': plot('usernet_degree')}),
+        Stage('snet-louvain', main.louvain_analysis, [graph('snet')], [], params={'graph': 'snet', 'processes': 1}),
+        Stage('usernet-louvain', main.louvain_analysis, [graph('usernet')], [],
+              params={'graph': 'usernet', 'processes': 1})
+    ]
+    return {stage.name: stage for stage in stages}
+
+
+def dependencies(stages):
+    producers = {output: stage.name for stage in stages.values() for output in stage.outputs}
+    return {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in stages.values()}
+
+
+def required(stages, targets):
+    depends_on = dependencies(stages)
+    needed, stack = set(), list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in needed:
+            needed.add(name)
+            stack.extend(depends_on[name])
+    return needed
+
+
+def load_manifest():
+    if not os.path.exists(f"{cache_path}/manifest.json"):
+        return {'stages': {}, 'files': {}}
+    with open(f"{cache_path}/manifest.json") as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(manifest):
+    with open(f"{cache_path}/manifest.json", 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+
+def file_digest(path, manifest):
+    # Content hashes are remembered by size and modification time, so unchanged files are only read once
+    status = os.stat(path)
+    known = manifest['files'].get(path)
+    if known is not None and known[:2] == [status.st_size, status.st_mtime_ns]:
+        return known[2]
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as data_file:
+        for block in iter(lambda: data_file.read(2 ** 20), b''):
+            digest.update(block)
+    manifest['files'][path] = [status.st_size, status.st_mtime_ns, digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def fingerprint(path, manifest):
+    if not os.path.exists(path):
+        return None
+    if os.path.isfile(path):
+        return file_digest(path, manifest)
+    digest = hashlib.blake2b(digest_size=16)
+    for root, directories, files in os.walk(path):
+        directories.sort()
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(file_digest(file_path, manifest).encode())
+    return digest.hexdigest()
+
+
+def project_modules(module, directory, found):
+    found[os.path.abspath(module.__file__)] = module
+    for value in vars(module).values():
+        if isinstance(value, types.ModuleType) and getattr(value, '__file__', None) \
+                and os.path.dirname(os.path.abspath(value.__file__)) == directory \
+                and os.path.abspath(value.__file__) not in found:
+            project_modules(value, directory, found)
+    return found
+
+
+def reached_code(function):
+    # Definitions of main.py the stage's function reaches through the names they use, and the project
+    # modules they reach, along with the project modules those import. Other modules count as a whole,
+    # since their functions are not followed any further. Module level statements of main.py set the
+    # paths and tables its functions read, so they count for every stage.
+    directory = os.path.dirname(os.path.abspath(main.__file__))
+    with open(main.__file__) as source_file:
+        tree = ast.parse(source_file.read())
+    definitions, statements = {}, []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            definitions[node.name] = node
+        elif not (isinstance(node, ast.If) and ast.unparse(node.test) == "__name__ == '__main__'"):
+            statements.append(node)
+    reached, modules, stack = set(), {}, [function.__name__]
+    while stack:
+        name = stack.pop()
+        if name in reached:
+            continue
+        reached.add(name)
+        for used in {node.id for node in ast.walk(definitions[name]) if isinstance(node, ast.Name)}:
+            value = vars(main).get(used)
+            if used in definitions:
+                stack.append(used)
+            elif isinstance(value, types.ModuleType) and getattr(value, '__file__', None) \
+                    and os.path.dirname(os.path.abspath(value.__file__)) == directory:
+                project_modules(value, directory, modules)
+    # ast.dump leaves out comments and positions, so only changes to the code itself count
+    parts = [ast.dump(node) for node in statements] + [ast.dump(definitions[name]) for name in sorted(reached)]
+    return parts, sorted(modules)
+
+
+def code_fingerprint(stage, manifest):
+    parts, paths = reached_code(stage.function)
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode())
+    for path in paths:
+        digest.update(f"{os.path.basename(path)}:{file_digest(path, manifest)}".encode())
+    return digest.hexdigest()
+
+
+def stage_key(stage, manifest):
+    # The cache key covers the input contents, the parameters and the code of the stage
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(stage.name.encode())
+    digest.update(code_fingerprint(stage, manifest).encode())
+    digest.update(json.dumps(stage.params, sort_keys=True).encode())
+    for path in stage.inputs:
+        digest.update(f"{path}:{fingerprint(path, manifest)}".encode())
+    return digest.hexdigest()
+
+
+def is_cached(stage, key, manifest):
+    entry = manifest['stages'].get(stage.name)
+    if entry is None or entry['key'] != key:
+        return False
+    # Outputs are checked as well, in case they were deleted or changed by hand since
+    return all(fingerprint(path, manifest) == entry['outputs'].get(path)
+               for path in stage.outputs + [stage.log_path()])
+
+
+def initialize_worker(paths):
+    for name, value in paths.items():
+        setattr(main, name, value)
+
+
+def run_stage(name):
+    stage = default_stages()[name]
+    with open(stage.log_path(), 'w') as log_file, contextlib.redirect_stdout(log_file):
+        stage.function(**stage.params)
+    return name
+
+
+def print_log(stage, status):
+    print(f"== {stage.name} ({status})")
+    with open(stage.log_path()) as log_file:
+        print(log_file.read(), end='')
+
+
+def run(targets=None, force=(), processes=None):
+    stages = default_stages()
+    needed = required(stages, targets or list(stages))
+    depends_on = dependencies(stages)
+    os.makedirs(f"{cache_path}/logs", exist_ok=True)
+    for path in (main.graphs_path, main.dendrograms_path):
+        os.makedirs(path, exist_ok=True)
+    manifest = load_manifest()
+    finished, running, statuses, keys = set(), {}, {}, {}
+    paths = {name: getattr(main, name) for name in path_names}
+
+    def complete(name):
+        stage = stages[name]
+        manifest['stages'][name] = {'key': keys[name],
+                                    'outputs': {path: fingerprint(path, manifest)
+                                                for path in stage.outputs + [stage.log_path()]}}
+        save_manifest(manifest)
+        finished.add(name)
+        statuses[name] = 'run'
+        print_log(stage, 'run')
+
+    with contextlib.ExitStack() as stack:
+        executor = None
+        if processes is None or processes > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(processes, initializer=initialize_worker,
+                                                               initargs=(paths,)))
+        while len(finished) < len(needed):
+            ready = sorted(name for name in needed - finished - set(running.values())
+                           if depends_on[name] <= finished)
+            for name in ready:
+                # Inputs are complete once every stage producing them has finished
+                keys[name] = stage_key(stages[name], manifest)
+                if name not in force and is_cached(stages[name], keys[name], manifest):
+                    finished.add(name)
+                    statuses[name] = 'cached'
+                    print_log(stages[name], 'cached')
+                elif executor is None:
+                    run_stage(name)
+                    complete(name)
+                else:
+                    # An interrupted run must not leave the previous entry looking valid
+                    manifest['stages'].pop(name, None)
+                    running[executor.submit(run_stage, name)] = name
+            if not running or finished.intersection(ready):
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                future.result()
+                complete(name)
+    return statuses
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the analysis pipeline, skipping stages whose results are cached.')
+    parser.add_argument('targets', nargs='*', help='stages to run, along with the stages they depend on')
+    parser.add_argument('--force', nargs='*', default=[], help='stages to rerun even if cached')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--list', action='store_true', help='list the stages and exit')
+    arguments = parser.parse_args()
+    if arguments.list:
+        for stage_name, stage_dependencies in dependencies(default_stages()).items():
+            print(f"{stage_name}: {', '.join(sorted(stage_dependencies))}")
+    else:
+        run(arguments.targets, set(arguments.force), arguments.processes)
@@ -0,0 +1,37 @@
+import hashlib
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+
+def to_networkx(labels, adjacency, directed=False):
+    graph = nx.DiGraph() if directed else nx.Graph()
+    graph.add_nodes_from(labels)
+    # An undirected adjacency is symmetric, so every edge is read once from the upper triangle
+    edges = adjacency.tocoo() if directed else sparse.triu(adjacency, format='coo')
+    graph.add_weighted_edges_from(zip(labels[edges.row], labels[edges.col], edges.data.tolist()))
+    return graph
+
+
+def from_networkx(graph, weight='weight'):
+    labels = np.empty(graph.number_of_nodes(), dtype=object)
+    labels[:] = list(graph.nodes())
+    adjacency = nx.to_scipy_sparse_array(graph, nodelist=labels, weight=weight, format='csr')
+    return labels, adjacency
+
+
+def is_directed(adjacency, directed=None):
+    # Graphs carry their flag from where they were loaded, comparing with the transpose is only
+    # a fallback for bare matrices, and takes a symmetric directed graph for an undirected one
+    if directed is not None:
+        return directed
+    return (adjacency != adjacency.T).nnz > 0
+
+
+def fingerprint(adjacency):
+    adjacency = adjacency.tocsr()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.asarray(adjacency.shape, dtype=np.int64).tobytes())
+    for values in (adjacency.indptr, adjacency.indices, adjacency.data):
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
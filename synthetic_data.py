@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import pandas as pd
+
+domains = ['self', 'imgur.com', 'youtube.com', 'nytimes.com', 'bbc.co.uk', 'github.com', 'wikipedia.org']
+
+
+def zipf_weights(n, exponent):
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def base36(numbers):
+    digits = np.array(list('0123456789abcdefghijklmnopqrstuvwxyz'))
+    numbers = np.asarray(numbers, dtype=np.int64)
+    width = max(int(np.ceil(np.log(max(numbers.max(initial=1), 1) + 1) / np.log(36))), 1)
+    columns = [digits[(numbers // 36 ** power) % 36] for power in range(width - 1, -1, -1)]
+    return np.array([''.join(chars).lstrip('0') or '0' for chars in zip(*columns)], dtype=object)
+
+
+def generate_month(rng, month, users, subreddits, submissions, comments, deleted_fraction, start_id,
+                   user_exponent=1.1, subreddit_exponent=1.2, first_timestamp=1199145600):
+    # Activity of both users and subreddits is heavy-tailed (Zipf-like)
+    user_weights = zipf_weights(len(users), user_exponent)
+    subreddit_weights = zipf_weights(len(subreddits), subreddit_exponent)
+    month_seconds = 30 * 24 * 3600
+    month_start = first_timestamp + month * month_seconds
+
+    submission_ids = base36(start_id + np.arange(submissions))
+    submission_subreddits = rng.choice(len(subreddits), submissions, p=subreddit_weights)
+    submission_authors = users[rng.choice(len(users), submissions, p=user_weights)].astype(object)
+    submission_authors[rng.random(submissions) < deleted_fraction] = '[deleted]'
+    num_comments = np.zeros(submissions, dtype=np.int64)
+
+    comment_ids = base36(start_id + submissions + np.arange(comments))
+    comment_authors = users[rng.choice(len(users), comments, p=user_weights)].astype(object)
+    comment_authors[rng.random(comments) < deleted_fraction] = '[deleted]'
+    # Comments reply to a submission, picked by popularity, or to an earlier comment on the same thread
+    threads = rng.choice(submissions, comments, p=zipf_weights(submissions, 1.0)[rng.permutation(submissions)])
+    replies_to_comment = rng.random(comments) < 0.6
+    parent_ids = np.empty(comments, dtype=object)
+    last_comment = {}
+    for i, thread in enumerate(threads.tolist()):
+        if replies_to_comment[i] and thread in last_comment:
+            earlier = last_comment[thread]
+            parent_ids[i] = 't1_' + comment_ids[earlier[rng.integers(len(earlier))]]
+        else:
+            parent_ids[i] = 't3_' + submission_ids[thread]
+        last_comment.setdefault(thread, []).append(i)
+    np.add.at(num_comments, threads, 1)
+
+    submission_data = pd.DataFrame({
+        'id': submission_ids,
+        'author': submission_authors,
+        'subreddit': subreddits[submission_subreddits],
+        'title': [f"Submission {i}" for i in submission_ids],
+        'num_comments': num_comments,
+        'over_18': rng.random(submissions) < 0.05,
+        'domain': rng.choice(domains, submissions),
+        'created_utc': month_start + np.sort(rng.integers(0, month_seconds, submissions))
+    })
+    comment_data = pd.DataFrame({
+        'id': comment_ids,
+        'author': comment_authors,
+        'subreddit': subreddits[submission_subreddits[threads]],
+        'parent_id': parent_ids,
+        'body': 'comment',
+        'created_utc': month_start + np.sort(rng.integers(0, month_seconds, comments))
+    })
+    return submission_data, comment_data
+
+
+def generate_dataset(path, months=1, users=1000, subreddits=100, submissions=2000, comments=10000,
+                     deleted_fraction=0.05, seed=0):
+    # Same arguments and seed always produce the same files
+    rng = np.random.default_rng(seed)
+    user_names = np.array([f"user_{i}" for i in range(users)], dtype=object)
+    subreddit_names = np.array(['reddit.com'] + [f"subreddit_{i}" for i in range(1, subreddits)], dtype=object)
+    os.makedirs(f"{path}/submissions", exist_ok=True)
+    os.makedirs(f"{path}/comments", exist_ok=True)
+    next_id = 36 ** 4
+    for month in range(months):
+        submission_data, comment_data = generate_month(rng, month, user_names, subreddit_names, submissions, comments,
+                                                       deleted_fraction, next_id)
+        next_id += submissions + comments
+        file = f"RC_2008-{month % 12 + 1:02d}.csv" if months <= 12 else f"RC_{month:04d}.csv"
+        submission_data.to_csv(f"{path}/submissions/{file}", index=False)
+        comment_data.to_csv(f"{path}/comments/{file}", index=False)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+import centrality
+import distances
+import instrumentation
+import main
+import sparse_graph
+
+week = 7 * 24 * 60 * 60
+month = 30 * 24 * 60 * 60
+
+
+class SlidingWindow:
+    # Records are sorted by creation time once, and the window is two positions into them:
+    # moving it adds the records that enter and removes the ones that leave, so a step
+    # costs as much as the records that changed, whatever the size of the window.
+    def __init__(self, submission_data, comment_data):
+        subreddit_codes, self.subreddits = main.encode_columns(submission_data['subreddit'],
+                                                               comment_data['subreddit'])
+        author_codes, self.authors = main.encode_columns(submission_data['author'], comment_data['author'])
+        # Replies are resolved against the whole corpus, a parent may have been posted before the window
+        parent_codes = np.concatenate([np.full(len(submission_data), -1),
+                                       main.parent_author_codes(submission_data, comment_data,
+                                                                author_codes[:len(submission_data)],
+                                                                author_codes[len(submission_data):])])
+        times = np.concatenate([submission_data['created_utc'].to_numpy(np.int64),
+                                comment_data['created_utc'].to_numpy(np.int64)])
+        order = np.argsort(times, kind='stable')
+        self.times = times[order]
+        self.records = list(zip(subreddit_codes[order].tolist(), author_codes[order].tolist(),
+                                parent_codes[order].tolist()))
+        self.start = 0
+        self.end = 0
+        # Records of every (author, subreddit) membership and every (child, parent) reply pair in the window
+        self.memberships = {}
+        self.replies = {}
+        self.subreddits_by_user = {}
+        self.user_counts = {}
+        # Co-membership weights, keyed by (s1, s2) with s1 < s2
+        self.snet = {}
+
+    def add(self, subreddit, author, parent):
+        key = (author, subreddit)
+        count = self.memberships.get(key, 0)
+        self.memberships[key] = count + 1
+        if count == 0:
+            subreddits = self.subreddits_by_user.setdefault(author, set())
+            for other in subreddits:
+                pair = (other, subreddit) if other < subreddit else (subreddit, other)
+                self.snet[pair] = self.snet.get(pair, 0) + 1
+            subreddits.add(subreddit)
+            self.user_counts[subreddit] = self.user_counts.get(subreddit, 0) + 1
+        if parent >= 0:
+            self.replies[(author, parent)] = self.replies.get((author, parent), 0) + 1
+
+    def remove(self, subreddit, author, parent):
+        key = (author, subreddit)
+        count = self.memberships.pop(key) - 1
+        if count > 0:
+            self.memberships[key] = count
+        else:
+            subreddits = self.subreddits_by_user[author]
+            subreddits.remove(subreddit)
+            for other in subreddits:
+                pair = (other, subreddit) if other < subreddit else (subreddit, other)
+                weight = self.snet.pop(pair) - 1
+                if weight > 0:
+                    self.snet[pair] = weight
+            if not subreddits:
+                del self.subreddits_by_user[author]
+            users = self.user_counts.pop(subreddit) - 1
+            if users > 0:
+                self.user_counts[subreddit] = users
+        if parent >= 0:
+            replies = self.replies.pop((author, parent)) - 1
+            if replies > 0:
+                self.replies[(author, parent)] = replies
+
+    def advance(self, start_time, end_time):
+        # The window covers [start_time, end_time), and only moves forward
+        end = max(np.searchsorted(self.times, end_time), self.end)
+        start = max(min(np.searchsorted(self.times, start_time), end), self.start)
+        for i in range(self.end, end):
+            self.add(*self.records[i])
+        for i in range(self.start, start):
+            self.remove(*self.records[i])
+        instrumentation.count('records_changed', (end - self.end) + (start - self.start))
+        self.start, self.end = start, end
+
+    def windows(self, window, step):
+        if len(self.times) == 0:
+            return
+        start_time = self.times[0]
+        while start_time <= self.times[-1]:
+            self.advance(start_time, start_time + window)
+            yield start_time
+            start_time += step
+
+    def snet_adjacency(self):
+        nodes = np.array(sorted(self.user_counts), dtype=np.int64)
+        positions = np.full(len(self.subreddits), -1)
+        positions[nodes] = np.arange(len(nodes))
+        pairs = np.array(list(self.snet), dtype=np.int64).reshape(-1, 2)
+        weights = np.fromiter(self.snet.values(), dtype=np.int64, count=len(self.snet))
+        rows, cols = positions[pairs[:, 0]], positions[pairs[:, 1]]
+        adjacency = sparse.csr_array((np.concatenate([weights, weights]),
+                                      (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+                                     shape=(len(nodes), len(nodes)))
+        return self.subreddits[nodes], adjacency
+
+    def usernet_adjacency(self):
+        pairs = np.array(list(self.replies), dtype=np.int64).reshape(-1, 2)
+        # Active authors, and the parents they replied to even if those were not active in the window
+        nodes = np.union1d(np.fromiter(self.subreddits_by_user, dtype=np.int64, count=len(self.subreddits_by_user)),
+                           pairs[:, 1])
+        positions = np.full(len(self.authors), -1)
+        positions[nodes] = np.arange(len(nodes))
+        weights = np.fromiter(self.replies.values(), dtype=np.int64, count=len(self.replies))
+        adjacency = sparse.csr_array((weights, (positions[pairs[:, 0]], positions[pairs[:, 1]])),
+                                     shape=(len(nodes), len(nodes)))
+        return self.authors[nodes], adjacency
+
+    def snet_graph(self):
+        return sparse_graph.to_networkx(*self.snet_adjacency())
+
+    def usernet_graph(self):
+        return sparse_graph.to_networkx(*self.usernet_adjacency(), directed=True)
+
+    def metrics(self):
+        # Graph level metrics are computed on the current snapshot, in time linear in its size
+        metrics = {'records': self.end - self.start}
+        for name, (labels, adjacency), edges, directed in (
+                ('snet', self.snet_adjacency(), len(self.snet), False),
+                ('usernet', self.usernet_adjacency(), len(self.replies), True)):
+            n = len(labels)
+            pairs = n * (n - 1) / (1 if directed else 2)
+            metrics[f"{name}_nodes"] = n
+            metrics[f"{name}_edges"] = edges
+            metrics[f"{name}_density"] = edges / pairs if pairs > 0 else 0.0
+            metrics[f"{name}_dominant_cc"] = len(distances.largest_component(adjacency)[0]) if n > 0 else 0
+            scores = centrality.degree_centrality(adjacency, directed)
+            metrics[f"{name}_top_degree"] = labels[scores.argmax()] if n > 0 else None
+            metrics[f"{name}_top_degree_centrality"] = scores.max() if n > 0 else 0.0
+        return metrics
+
+    def series(self, window, step):
+        rows = {pd.to_datetime(start_time, unit='s'): self.metrics() for start_time in self.windows(window, step)}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+
+@instrumentation.instrumented
+def temporal_analysis(window=month, step=week):
+    submission_data = main.load_cleansed_data(main.cleansed_submission_data_path,
+                                              ['id', 'author', 'subreddit', 'created_utc'])
+    comment_data = main.load_cleansed_data(main.cleansed_comment_data_path,
+                                           ['id', 'author', 'subreddit', 'parent_id', 'created_utc'])
+    series = SlidingWindow(submission_data, comment_data).series(window, step)
+    instrumentation.record(windows=len(series))
+    print(series.to_string())
+    return series
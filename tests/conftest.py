@@ -0,0 +1,50 @@
+import os
+import sys
+import matplotlib
+
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import benchmark
+import centrality
+import communities
+import distributions
+import incremental
+import main
+import pipeline
+import synthetic_data
+import thresholds
+
+
+def edges(graph):
+    # Edge weights by endpoints, unordered for undirected graphs, so graphs compare whatever their node order
+    return {(u, v) if graph.is_directed() else frozenset((u, v)): weight for u, v, weight in graph.edges(data='weight')}
+
+
+def assert_same_graph(first, second):
+    assert first.is_directed() == second.is_directed()
+    assert set(first.nodes()) == set(second.nodes())
+    assert edges(first) == edges(second)
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # Every path the analysis works with points into a temporary directory, restored afterwards
+    for name in pipeline.path_names:
+        monkeypatch.setattr(main, name, getattr(main, name))
+    monkeypatch.setattr(incremental, 'state_path', f"{tmp_path}/incremental_state")
+    monkeypatch.setattr(communities, 'cache_path', f"{tmp_path}/communities")
+    benchmark.use_workspace(str(tmp_path))
+    for cache in (main.statistics_cache, centrality.cache, distributions.cache, thresholds.cache):
+        cache.clear()
+    return str(tmp_path)
+
+
+@pytest.fixture
+def dataset(workspace):
+    # One month of a small synthetic dump, cleansed
+    synthetic_data.generate_dataset(workspace, users=300, subreddits=40, submissions=400, comments=2000)
+    main.create_secondary_dataset()
+    return workspace
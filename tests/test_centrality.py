@@ -0,0 +1,35 @@
+import networkx as nx
+import numpy as np
+import centrality
+import main
+import sparse_graph
+
+
+def snet_component():
+    # Dominant component of the SNet of the dataset, with its co-membership weights
+    main.model_snet_graph()
+    graph = main.load_graph('snet')
+    return graph.subgraph(max(nx.connected_components(graph), key=len)).copy()
+
+
+def scores(labels, values):
+    return dict(zip(labels, values))
+
+
+def assert_close(first, second, tolerance=1e-6):
+    assert first.keys() == second.keys()
+    assert np.allclose([first[node] for node in first], [second[node] for node in first], atol=tolerance)
+
+
+def test_centrality_matches_networkx(dataset):
+    graph = snet_component()
+    labels, adjacency = sparse_graph.from_networkx(graph)
+    computed = centrality.centrality_scores(adjacency, processes=1, directed=False)
+    lambda_max = centrality.lambda_max(adjacency, directed=False)
+    assert_close(scores(labels, computed['DC']), nx.degree_centrality(graph))
+    assert_close(scores(labels, computed['CC']), nx.closeness_centrality(graph))
+    assert_close(scores(labels, computed['BC']), nx.betweenness_centrality(graph))
+    assert_close(scores(labels, computed['EVC']), nx.eigenvector_centrality_numpy(graph, weight='weight'))
+    assert_close(scores(labels, computed['KC']),
+                 nx.katz_centrality_numpy(graph, alpha=1 / (2 * lambda_max), weight='weight'))
+
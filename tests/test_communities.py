@@ -0,0 +1,34 @@
+import networkx as nx
+import numpy as np
+import pytest
+import communities
+import main
+
+
+@pytest.mark.parametrize('name', ['snet', 'usernet'])
+def test_modularity_matches_networkx(dataset, name):
+    main.model_snet_graph()
+    main.model_usernet_graph()
+    _, adjacency, directed = main.load_adjacency(name)
+    # Louvain and modularity see UserNet with its replies counted in both directions
+    graph = communities.integer_graph(adjacency, directed)
+    partitions = communities.louvain_ensemble(adjacency, resolutions=(0.5, 1.0, 2.0), seeds=range(2), processes=1,
+                                              directed=directed)
+    for (resolution, _), partition in partitions.items():
+        expected = nx.community.modularity(graph, [np.flatnonzero(partition == community).tolist()
+                                                   for community in range(partition.max() + 1)],
+                                           weight='weight', resolution=resolution)
+        assert communities.modularity(adjacency, partition, resolution, directed) == pytest.approx(expected)
+    # Partitions of the same run are identical up to the numbering of their communities
+    partition = next(iter(partitions.values()))
+    assert communities.normalized_mutual_information(partition, partition.max() - partition) == pytest.approx(1.0)
+
+
+def test_modularity_counts_self_loops_as_networkx():
+    graph = nx.karate_club_graph()
+    graph.add_edge(0, 0, weight=3)
+    adjacency = nx.to_scipy_sparse_array(graph, weight='weight')
+    partition = np.array([graph.nodes[node]['club'] == 'Officer' for node in graph], dtype=np.int64)
+    expected = nx.community.modularity(graph, [np.flatnonzero(partition == community).tolist()
+                                               for community in (0, 1)], weight='weight')
+    assert communities.modularity(adjacency, partition, directed=False) == pytest.approx(expected)
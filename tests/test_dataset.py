@@ -0,0 +1,44 @@
+import os
+import pickle
+import pandas as pd
+import main
+import synthetic_data
+
+
+def raw_data(path, columns):
+    data = pd.concat([pd.read_csv(f"{path}/{file}", usecols=list(columns)) for file in sorted(os.listdir(path))],
+                     ignore_index=True)
+    return data[data['author'] != '[deleted]'].reset_index(drop=True)
+
+
+def test_partitions_round_trip(workspace):
+    synthetic_data.generate_dataset(workspace, months=2, users=300, subreddits=40, submissions=400, comments=2000)
+    main.create_secondary_dataset(chunksize=700)
+    assert len(os.listdir(main.cleansed_comment_data_path)) > 2
+    for data_path, cleansed_path, columns in (
+            (main.submission_data_path, main.cleansed_submission_data_path, main.submission_columns),
+            (main.comment_data_path, main.cleansed_comment_data_path, main.comment_columns)):
+        expected = raw_data(data_path, columns)
+        cleansed = main.load_cleansed_data(cleansed_path)
+        assert set(cleansed.columns) == set(columns)
+        # Files are read in directory order, so rows are compared whatever their order
+        assert sorted(zip(*(cleansed[column].astype(str) for column in columns))) \
+            == sorted(zip(*(expected[column].astype(str) for column in columns)))
+        # Only the requested columns are read
+        assert list(main.load_cleansed_data(cleansed_path, ['author']).columns) == ['author']
+
+
+def test_pickled_dataset_is_replaced(workspace):
+    synthetic_data.generate_dataset(workspace, users=300, subreddits=40, submissions=400, comments=2000)
+    main.create_secondary_dataset()
+    for path in (main.cleansed_submission_data_path, main.cleansed_comment_data_path):
+        data = main.load_cleansed_data(path)
+        for partition in os.listdir(path):
+            os.remove(f"{path}/{partition}")
+        os.rmdir(path)
+        with open(path, 'wb') as pickled:
+            pickle.dump(data, pickled)
+        assert len(main.load_cleansed_data(path, ['author'])) == len(data)
+    main.create_secondary_dataset()
+    assert os.path.isdir(main.cleansed_submission_data_path)
+    assert os.path.isdir(main.cleansed_comment_data_path)
@@ -0,0 +1,22 @@
+import networkx as nx
+import pytest
+import distances
+import main
+
+
+@pytest.mark.parametrize('name, component', [('usernet', 'strong'), ('snet', 'weak')])
+def test_exact_distances_match_networkx(dataset, name, component):
+    main.model_snet_graph()
+    main.model_usernet_graph()
+    graph = main.load_graph(name)
+    _, adjacency, directed = main.load_adjacency(name)
+    computed = distances.distance_statistics(adjacency, component=component, processes=1, directed=directed)
+    connected = nx.strongly_connected_components if directed else nx.connected_components
+    largest = graph.subgraph(max(connected(graph), key=len))
+    assert computed['exact'] and computed['nodes'] == largest.number_of_nodes() > 1
+    assert computed['average_distance'] == pytest.approx(nx.average_shortest_path_length(largest))
+    assert computed['diameter'] == nx.diameter(largest)
+    # Sampled sources only bound the diameter, from both sides
+    sampled = distances.distance_statistics(adjacency, component=component, sample_size=20, seed=0, processes=1,
+                                            directed=directed)
+    assert sampled['diameter_bounds'][0] <= computed['diameter'] <= sampled['diameter_bounds'][1]
@@ -0,0 +1,46 @@
+import os
+import networkx as nx
+import numpy as np
+import distributions
+import main
+import sparse_graph
+
+
+def test_degrees_match_networkx(dataset):
+    main.model_snet_graph()
+    main.model_usernet_graph()
+    for name in ('snet', 'usernet'):
+        graph = main.load_graph(name)
+        labels, adjacency, directed = main.load_adjacency(name)
+        for weighted in (False, True):
+            expected = dict(graph.degree(weight='weight' if weighted else None))
+            assert np.array_equal(distributions.degrees(adjacency, weighted, directed),
+                                  [expected[label] for label in labels])
+        assert sorted(distributions.edge_weights(adjacency, directed)) \
+            == sorted(weight for _, _, weight in graph.edges(data='weight'))
+
+
+def test_self_loops_count_twice():
+    graph = nx.Graph([(0, 0), (0, 1)])
+    _, adjacency = sparse_graph.from_networkx(graph)
+    assert distributions.degrees(adjacency, directed=False).tolist() == [d for _, d in graph.degree()]
+
+
+def test_log_bins_keep_every_value():
+    values = np.random.default_rng(0).zipf(2.0, 5000)
+    centers, densities = distributions.histogram(values, log_bins=True)
+    assert centers.min() >= values.min() and centers.max() <= values.max()
+    # Densities times the bin widths add up to the number of values again
+    low, high = values.min(), values.max()
+    bins = int(np.ceil(np.log10(high / low) * 10))
+    edges = np.geomspace(low, high, bins + 1)
+    widths = np.diff(edges)[np.histogram(values, bins=edges)[0] > 0]
+    assert np.isclose((densities * widths).sum(), len(values))
+    centers, densities = distributions.histogram([3, 3, 3], log_bins=True)
+    assert len(centers) == 1 and np.isfinite(densities).all() and np.isclose(centers[0], 3)
+
+
+def test_histograms_of_names_and_graphs(dataset):
+    main.model_snet_graph()
+    assert os.path.exists(main.draw_degree_histogram('snet', xscale='log', yscale='log'))
+    assert os.path.exists(main.draw_edge_weight_histogram(main.load_graph('snet')))
@@ -0,0 +1,24 @@
+import networkx as nx
+import numpy as np
+import graph_store
+import sparse_graph
+from conftest import assert_same_graph
+
+
+def test_round_trip(tmp_path):
+    for graph in (nx.les_miserables_graph(), nx.gnp_random_graph(50, 0.1, seed=1, directed=True)):
+        graph = nx.relabel_nodes(graph, str)
+        graph.add_weighted_edges_from((u, v, 1) for u, v in graph.edges() if 'weight' not in graph[u][v])
+        graph_store.write_networkx(graph, f"{tmp_path}/graph")
+        assert_same_graph(graph_store.read_networkx(f"{tmp_path}/graph"), graph)
+
+
+def test_rewrite_leaves_loaded_graphs_alone(tmp_path):
+    labels, adjacency = sparse_graph.from_networkx(nx.relabel_nodes(nx.les_miserables_graph(), str))
+    graph_store.write_graph(f"{tmp_path}/graph", labels, adjacency, False)
+    _, loaded, _ = graph_store.read_graph(f"{tmp_path}/graph")
+    total = loaded.data.sum()
+    graph_store.write_graph(f"{tmp_path}/graph", labels[:10], adjacency[:10][:, :10], False)
+    assert loaded.data.sum() == total
+    assert graph_store.read_graph(f"{tmp_path}/graph")[1].shape == (10, 10)
+    assert np.array_equal(graph_store.read_graph(f"{tmp_path}/graph")[1].toarray(), adjacency[:10][:, :10].toarray())
@@ -0,0 +1,17 @@
+import itertools
+import networkx as nx
+import numpy as np
+import pytest
+from scipy.cluster.hierarchy import cut_tree
+import hierarchy
+
+
+@pytest.mark.parametrize('graph', [nx.karate_club_graph(), nx.connected_watts_strogatz_graph(60, 4, 0.1, seed=1)])
+def test_girvan_newman_cuts_match_networkx(graph):
+    graph = nx.Graph(graph.edges())
+    nodes = list(graph.nodes())
+    linkage = hierarchy.girvan_newman_linkage(graph)
+    for communities in itertools.islice(nx.community.girvan_newman(graph), 8):
+        cut = cut_tree(linkage, n_clusters=len(communities))[:, 0]
+        assert {frozenset(np.asarray(nodes)[cut == cluster].tolist()) for cluster in np.unique(cut)} \
+            == {frozenset(community) for community in communities}
@@ -0,0 +1,132 @@
+import os
+import shutil
+import networkx as nx
+import pandas as pd
+import pytest
+import incremental
+import main
+import sparse_graph
+import synthetic_data
+import thresholds
+from conftest import assert_same_graph
+
+derived_graphs = ('snet', 'snetf', 'snetf-dom', 'snett', 'usernet')
+
+
+def generate(path, months=1):
+    synthetic_data.generate_dataset(path, months=months, users=300, subreddits=40, submissions=400, comments=2000)
+    return sorted(os.listdir(f"{path}/submissions"))
+
+
+def hold_back(workspace, files):
+    # Only the first month is in the dataset to begin with, the others arrive together once it is built
+    os.makedirs(f"{workspace}/later/submissions")
+    os.makedirs(f"{workspace}/later/comments")
+    for file in files[1:]:
+        for kind in ('submissions', 'comments'):
+            shutil.move(f"{workspace}/{kind}/{file}", f"{workspace}/later/{kind}/{file}")
+    main.create_secondary_dataset()
+    for file in files[1:]:
+        for kind in ('submissions', 'comments'):
+            shutil.move(f"{workspace}/later/{kind}/{file}", f"{workspace}/{kind}/{file}")
+
+
+def assert_matches_rebuild(workspace):
+    ingested = {name: main.load_graph(name) for name in derived_graphs}
+    ingested_rows = {path: len(main.load_cleansed_data(path))
+                     for path in (main.cleansed_submission_data_path, main.cleansed_comment_data_path)}
+    main.graphs_path = f"{workspace}/rebuilt"
+    os.makedirs(main.graphs_path)
+    main.create_secondary_dataset()
+    main.model_snet_graph()
+    main.model_usernet_graph()
+    main.model_snetf_graph()
+    main.extract_dominant_cc()
+    main.model_snett_graph()
+    assert ingested['snetf'].number_of_edges() > 0
+    for name in derived_graphs:
+        assert_same_graph(ingested[name], main.load_graph(name))
+    for path, rows in ingested_rows.items():
+        assert rows == len(main.load_cleansed_data(path))
+
+
+def test_incremental_matches_rebuild(workspace):
+    files = generate(workspace, months=3)
+    hold_back(workspace, files)
+    assert main.dataset_files() == files[:1]
+    for file in files[1:]:
+        incremental.ingest_file(file, chunksize=500)
+    assert main.dataset_files() == files
+    with pytest.raises(ValueError):
+        incremental.ingest_file(files[-1])
+    assert_matches_rebuild(workspace)
+
+
+def test_failed_ingests_leave_no_trace(workspace, monkeypatch):
+    files = generate(workspace, months=3)
+    hold_back(workspace, files)
+    incremental.ingest_file(files[1], chunksize=500)
+
+    def fail(*args):
+        raise RuntimeError
+    partitions = len(os.listdir(main.cleansed_comment_data_path))
+    # A failure before the state is saved drops everything the ingest wrote
+    with monkeypatch.context() as patch:
+        patch.setattr(incremental.GraphState, 'save', fail)
+        with pytest.raises(RuntimeError):
+            incremental.ingest_file(files[2], chunksize=500)
+    assert len(os.listdir(main.cleansed_comment_data_path)) == partitions
+    # A failure after it is saved leaves the partitions to the next ingest, which then finds the file ingested
+    with monkeypatch.context() as patch:
+        patch.setattr(incremental, 'publish',
+                      lambda state, publish=incremental.publish: fail() if files[2] in state.files else publish(state))
+        with pytest.raises(RuntimeError):
+            incremental.ingest_file(files[2], chunksize=500)
+    assert main.dataset_files() == files[:2]
+    with pytest.raises(ValueError):
+        incremental.ingest_file(files[2])
+    assert main.dataset_files() == files
+    incremental.write_graphs(incremental.GraphState(incremental.state_path))
+    assert_matches_rebuild(workspace)
+
+
+def test_comments_without_a_parent(workspace):
+    files = generate(workspace, months=2)
+    comments = pd.read_csv(f"{workspace}/comments/{files[1]}", dtype=str)
+    comments.loc[::7, 'parent_id'] = None
+    comments.loc[3::7, 'parent_id'] = 't1_'
+    comments.to_csv(f"{workspace}/comments/{files[1]}", index=False)
+    hold_back(workspace, files)
+    incremental.ingest_file(files[1], chunksize=500)
+    assert_matches_rebuild(workspace)
+
+
+def test_refreshes_skip_gml_and_the_threshold_index(workspace, monkeypatch):
+    files = generate(workspace, months=3)
+    monkeypatch.setattr(main, 'export_gml', True)
+    hold_back(workspace, files)
+    main.model_snet_graph()
+    assert os.path.exists(f"{main.graphs_path}/snet.gml")
+    incremental.ingest_file(files[1])
+    # The stale export is gone, and the setting is back for the full pipeline
+    assert not any(name.endswith('.gml') for name in os.listdir(main.graphs_path))
+    assert main.export_gml
+    assert not any(key[0] == 'index' for key in thresholds.cache)
+    incremental.ingest_file(files[2], export_gml=True)
+    assert_same_graph(main.load_graph('snetf'), nx.read_gml(f"{main.graphs_path}/snetf.gml"))
+
+
+def test_replies_wait_for_their_parents(workspace):
+    generate(workspace)
+    main.create_secondary_dataset()
+    submission_data = main.load_cleansed_data(main.cleansed_submission_data_path, ['id', 'author', 'subreddit'])
+    comment_data = main.load_cleansed_data(main.cleansed_comment_data_path, ['id', 'author', 'subreddit', 'parent_id'])
+    # Comments arrive before the submissions they reply to, and the state is reloaded in between
+    state = incremental.GraphState(f"{workspace}/state")
+    state.update(incremental.empty_frame(main.submission_columns), comment_data)
+    state.save()
+    state = incremental.GraphState(f"{workspace}/state")
+    state.update(submission_data, incremental.empty_frame(main.comment_columns))
+    authors, adjacency = main.model_usernet_adjacency()
+    assert_same_graph(sparse_graph.to_networkx(state.authors.array(), state.usernet, directed=True),
+                      sparse_graph.to_networkx(authors, adjacency, directed=True))
@@ -0,0 +1,17 @@
+import networkx as nx
+import numpy as np
+import link_analysis
+import main
+
+
+def test_hits_and_pagerank_match_networkx(dataset):
+    main.model_usernet_graph()
+    graph = main.load_graph('usernet')
+    labels, adjacency, _ = main.load_adjacency('usernet')
+    hubs, authorities, _ = link_analysis.hits(adjacency, tolerance=1e-12)
+    expected_hubs, expected_authorities = nx.hits(graph, max_iter=1000, tol=1e-12)
+    assert np.allclose(hubs, [expected_hubs[label] for label in labels], atol=1e-6)
+    assert np.allclose(authorities, [expected_authorities[label] for label in labels], atol=1e-6)
+    pagerank, _ = link_analysis.pagerank(adjacency, tolerance=1e-12, max_iterations=1000)
+    expected_pagerank = nx.pagerank(graph, tol=1e-12, max_iter=1000)
+    assert np.allclose(pagerank, [expected_pagerank[label] for label in labels], atol=1e-6)
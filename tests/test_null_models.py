@@ -0,0 +1,31 @@
+import networkx as nx
+import numpy as np
+import pytest
+import main
+import null_models
+import sparse_graph
+
+
+def test_local_clustering_matches_networkx(dataset):
+    main.model_snet_graph()
+    graph = main.load_graph('snet')
+    labels, adjacency, _ = main.load_adjacency('snet')
+    expected = nx.clustering(graph)
+    assert np.allclose(null_models.local_clustering(adjacency), [expected[label] for label in labels])
+
+
+def test_null_samples_are_simple_graphs():
+    graph = nx.karate_club_graph()
+    graph.add_edge(0, 0)
+    _, adjacency = sparse_graph.from_networkx(graph)
+    degrees = np.diff(adjacency.indptr)
+    rng = np.random.default_rng(0)
+    for sample in (null_models.gnp_sample(len(degrees), 0.2, rng), null_models.configuration_sample(degrees, rng)):
+        assert (sample != sample.T).nnz == 0
+        assert sample.diagonal().sum() == 0
+        assert set(np.unique(sample.data)) == {1}
+    summary = null_models.clustering_ensemble(adjacency, samples=5, seed=0, processes=1)
+    assert summary['observed']['average_clustering'] == pytest.approx(
+        nx.average_clustering(nx.Graph(nx.karate_club_graph())))
+    assert summary['gnp']['average_clustering'] == null_models.clustering_ensemble(
+        adjacency, samples=5, seed=0, processes=1)['gnp']['average_clustering']
@@ -0,0 +1,10 @@
+import main
+from conftest import assert_same_graph
+
+
+def test_sparse_snet_matches_pairwise(dataset):
+    main.model_snet_graph('sparse')
+    sparse_snet = main.load_graph('snet')
+    main.model_snet_graph('pairwise')
+    assert sparse_snet.number_of_edges() > 0
+    assert_same_graph(sparse_snet, main.load_graph('snet'))
@@ -0,0 +1,51 @@
+import itertools
+import networkx as nx
+import numpy as np
+import pandas as pd
+import main
+import synthetic_data
+import temporal
+from conftest import assert_same_graph
+
+
+def rebuilt_graphs(submission_data, comment_data, parent_authors, start_time, end_time):
+    # SNet and UserNet of the records posted in [start_time, end_time), built from scratch
+    def in_window(data):
+        return data[(data['created_utc'] >= start_time) & (data['created_utc'] < end_time)]
+
+    records = pd.concat([in_window(submission_data), in_window(comment_data)])
+    snet = nx.Graph()
+    snet.add_nodes_from(records['subreddit'].unique())
+    for _, subreddits in records.groupby('author', observed=True)['subreddit']:
+        for pair in itertools.combinations(sorted(subreddits.unique()), 2):
+            weight = snet.get_edge_data(*pair, {'weight': 0})['weight']
+            snet.add_edge(*pair, weight=weight + 1)
+    usernet = nx.DiGraph()
+    usernet.add_nodes_from(records['author'].unique())
+    replies = in_window(comment_data.assign(parent_author=parent_authors)).dropna(subset=['parent_author'])
+    for (author, parent), count in replies.groupby(['author', 'parent_author'], observed=True).size().items():
+        usernet.add_edge(author, parent, weight=count)
+    return snet, usernet
+
+
+def test_windows_match_rebuilds(workspace):
+    synthetic_data.generate_dataset(workspace, months=2, users=300, subreddits=40, submissions=400, comments=2000)
+    main.create_secondary_dataset()
+    submission_data = main.load_cleansed_data(main.cleansed_submission_data_path,
+                                              ['id', 'author', 'subreddit', 'created_utc'])
+    comment_data = main.load_cleansed_data(main.cleansed_comment_data_path,
+                                           ['id', 'author', 'subreddit', 'parent_id', 'created_utc'])
+    author_codes, authors = main.encode_columns(submission_data['author'], comment_data['author'])
+    parent_codes = main.parent_author_codes(submission_data, comment_data, author_codes[:len(submission_data)],
+                                            author_codes[len(submission_data):])
+    parent_authors = np.where(parent_codes >= 0, authors[np.maximum(parent_codes, 0)], None)
+    # Windows of ten days, four days apart, so records both enter and leave at every step
+    length, step = 10 * 24 * 60 * 60, 4 * 24 * 60 * 60
+    window = temporal.SlidingWindow(submission_data, comment_data)
+    windows = 0
+    for start_time in window.windows(length, step):
+        snet, usernet = rebuilt_graphs(submission_data, comment_data, parent_authors, start_time, start_time + length)
+        assert_same_graph(window.snet_graph(), snet)
+        assert_same_graph(window.usernet_graph(), usernet)
+        windows += 1
+    assert windows > 10
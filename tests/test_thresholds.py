@@ -0,0 +1,43 @@
+import networkx as nx
+import numpy as np
+import main
+import sparse_graph
+import thresholds
+from conftest import assert_same_graph
+
+
+def test_sweep_matches_connected_components(dataset):
+    main.model_snet_graph()
+    graph = main.load_graph('snet')
+    labels, adjacency = sparse_graph.from_networkx(graph)
+    index = thresholds.threshold_index(labels, adjacency)
+    edges = thresholds.sorted_edges(adjacency)
+    assert len(index.thresholds) > 1
+    for threshold in list(index.thresholds) + [index.thresholds[0] + 1]:
+        filtered = nx.Graph()
+        filtered.add_nodes_from(graph)
+        filtered.add_weighted_edges_from((u, v, w) for u, v, w in graph.edges(data='weight') if w >= threshold)
+        components = list(nx.connected_components(filtered))
+        summary = index.summary(threshold)
+        assert summary['edges'] == edges.count(threshold) == filtered.number_of_edges()
+        assert summary['components'] == len(components)
+        assert summary['dominant_size'] == max(len(component) for component in components)
+        assert index.dominant_component(threshold) in components
+        # Filtered graphs are slices of the sorted edges, not copies
+        assert np.shares_memory(edges.view(threshold)[2], edges.weights) or edges.count(threshold) == 0
+        assert_same_graph(sparse_graph.to_networkx(labels, edges.adjacency(threshold)), filtered)
+
+
+def test_snetf_and_its_dominant_component(dataset):
+    main.model_snet_graph()
+    main.model_snetf_graph('snet', w_threshold=10)
+    main.extract_dominant_cc('snetf')
+    snet = main.load_graph('snet')
+    snetf = nx.Graph()
+    snetf.add_nodes_from(snet)
+    snetf.add_weighted_edges_from((u, v, w) for u, v, w in snet.edges(data='weight') if w >= 10)
+    assert_same_graph(main.load_graph('snetf'), snetf)
+    assert_same_graph(main.load_graph('snetf-dom'), snetf.subgraph(max(nx.connected_components(snetf), key=len)))
+    # A networkx graph is taken as well as a stored one
+    main.extract_dominant_cc(snetf)
+    assert_same_graph(main.load_graph('snetf-dom'), snetf.subgraph(max(nx.connected_components(snetf), key=len)))
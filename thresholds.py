@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+import hierarchy
+import sparse_graph
+
+# Sorted edges and indexes already built for a graph, keyed by its fingerprint, so one sort serves every threshold
+cache = {}
+
+
+class SortedEdges:
+    # Every edge of an undirected graph once, from the heaviest to the lightest one: the graph
+    # filtered at threshold t is a prefix of these arrays, available as slices without a copy
+    def __init__(self, adjacency):
+        upper = sparse.triu(sparse.csr_array(adjacency), format='coo')
+        order = np.argsort(-upper.data, kind='stable')
+        self.n = adjacency.shape[0]
+        self.rows, self.cols, self.weights = upper.row[order], upper.col[order], upper.data[order]
+
+    def count(self, threshold):
+        # Weights are in descending order, the edges of weight >= threshold come first
+        return np.searchsorted(-self.weights, -threshold, side='right')
+
+    def view(self, threshold):
+        count = self.count(threshold)
+        return self.rows[:count], self.cols[:count], self.weights[:count]
+
+    def adjacency(self, threshold):
+        # Written out in both directions, as undirected graphs are stored, self-loops once
+        rows, cols, weights = self.view(threshold)
+        mirrored = rows != cols
+        return sparse.csr_array((np.concatenate([weights, weights[mirrored]]),
+                                 (np.concatenate([rows, cols[mirrored]]), np.concatenate([cols, rows[mirrored]]))),
+                                shape=(self.n, self.n))
+
+
+class ThresholdIndex:
+    # Edges are added from the heaviest to the lightest one, and a union-find over the nodes
+    # records the state of the graph after every distinct weight: the graph filtered at
+    # threshold t keeps exactly the edges added up to the last weight >= t.
+    # Every union also becomes a node of a merge tree, so the members of any component,
+    # at any threshold, are the leaves below one tree node.
+    def __init__(self, labels, edges):
+        rows, cols, weights = edges.rows, edges.cols, edges.weights
+        n = len(labels)
+        self.labels = labels
+        self.n = n
+        parents = list(range(n))
+        clusters = list(range(n))
+        sizes = [1] * n
+        self.children = []
+        dominant, dominant_size = (0, 1) if n > 0 else (-1, 0)
+        components = n
+        self.thresholds, self.edges, self.components, self.dominant_sizes, self.dominant_clusters = [], [], [], [], []
+        for i, (u, v) in enumerate(zip(rows.tolist(), cols.tolist())):
+            root_u, root_v = hierarchy.find(parents, u), hierarchy.find(parents, v)
+            if root_u != root_v:
+                if sizes[root_u] < sizes[root_v]:
+                    root_u, root_v = root_v, root_u
+                cluster = n + len(self.children)
+                self.children.append((clusters[root_u], clusters[root_v]))
+                parents[root_v] = root_u
+                sizes[root_u] += sizes[root_v]
+                clusters[root_u] = cluster
+                components -= 1
+                if sizes[root_u] > dominant_size:
+                    dominant, dominant_size = cluster, sizes[root_u]
+            if i == len(weights) - 1 or weights[i + 1] != weights[i]:
+                self.thresholds.append(weights[i])
+                self.edges.append(i + 1)
+                self.components.append(components)
+                self.dominant_sizes.append(dominant_size)
+                self.dominant_clusters.append(dominant)
+        self.thresholds = np.array(self.thresholds)
+
+    def step(self, threshold):
+        # Thresholds are in descending order, the last one >= threshold gives the filtered graph
+        return np.searchsorted(-self.thresholds, -threshold, side='right') - 1
+
+    def members(self, cluster):
+        nodes, stack = [], [cluster]
+        while stack:
+            cluster = stack.pop()
+            if cluster < self.n:
+                nodes.append(cluster)
+            else:
+                stack.extend(self.children[cluster - self.n])
+        return nodes
+
+    def summary(self, threshold):
+        step = self.step(threshold)
+        if step < 0:
+            return {'threshold': threshold, 'edges': 0, 'components': self.n, 'dominant_size': min(self.n, 1)}
+        return {'threshold': threshold, 'edges': self.edges[step], 'components': self.components[step],
+                'dominant_size': self.dominant_sizes[step]}
+
+    def sweep(self):
+        return pd.DataFrame({'threshold': self.thresholds, 'edges': self.edges, 'components': self.components,
+                             'dominant_size': self.dominant_sizes})
+
+    def dominant_nodes(self, threshold):
+        step = self.step(threshold)
+        if step < 0:
+            return np.arange(min(self.n, 1))
+        return np.sort(self.members(self.dominant_clusters[step]))
+
+    def dominant_component(self, threshold):
+        return set(self.labels[self.dominant_nodes(threshold)])
+
+
+def sorted_edges(adjacency):
+    key = ('edges', sparse_graph.fingerprint(adjacency))
+    if key not in cache:
+        cache[key] = SortedEdges(adjacency)
+    return cache[key]
+
+
+def threshold_index(labels, adjacency):
+    # The union-find pass runs in Python over every edge, so it is only built for the sweep statistics
+    key = ('index', sparse_graph.fingerprint(adjacency), hash(tuple(labels)))
+    if key not in cache:
+        cache[key] = ThresholdIndex(labels, sorted_edges(adjacency))
+    return cache[key]